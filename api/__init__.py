@@ -1,2 +1,7 @@
-from .weather_service import WeatherService
-
+from .weather_service import CityNotFoundError, WeatherService, WeatherServiceError
+from .transport import CircuitOpenError, DeadlineExceeded, TransportError
+from .scheduler import QuotaExceeded, QuotaScheduler
+from .cache import WeatherCache
+from .city_index import CityIndex
+from .payloads import PayloadError
+from .models import City, CurrentWeather, ForecastDay, ForecastSlot, GeoLocation
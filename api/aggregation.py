@@ -0,0 +1,176 @@
+import threading
+from datetime import datetime, timezone
+from config import Config
+from utils.telemetry import TELEMETRY
+from .models import ForecastDay
+
+# NumPy is optional and imported on the first large batch, see _numpy()
+USE_NUMPY = True
+np = None
+_np_lock = threading.Lock()
+_np_checked = False
+
+ICON_URL = Config.ICON_BASE_URL + "/{}.png"
+NUMPY_MIN_ROWS = 400
+
+# Bucket name -> (width in seconds, offset in seconds from local midnight)
+BUCKETS = {
+    "day": (86400, 0),
+    "12h": (43200, 0),
+    "6h": (21600, 0),
+    "daynight": (43200, 6 * 3600),  # 06:00-18:00 is day, 18:00-06:00 is night
+}
+
+
+def _numpy():
+    global np, _np_checked
+    if not _np_checked:
+        with _np_lock:
+            if not _np_checked:
+                try:
+                    import numpy
+                    np = numpy
+                except ImportError:  # Pure Python fallback, same results
+                    np = None
+                _np_checked = True
+    return np
+
+
+def _label(bucket, start):
+    # `start` is in the city's local time, so format it as if it were UTC
+    dt = datetime.fromtimestamp(start, tz=timezone.utc)
+    if bucket == "day":
+        return dt.strftime("%a %d")
+    if bucket == "daynight":
+        return dt.strftime("%a %d ") + ("Day" if dt.hour == 6 else "Night")
+    return dt.strftime("%a %d %H:%M")
+
+
+def _columns(payloads):
+    # Flatten the payloads into parallel columns, one row per 3-hourly slot
+    dt, offsets, temp, temp_min, temp_max, icons, city_idx = [], [], [], [], [], [], []
+    for i, data in enumerate(payloads):
+        items = data.list
+        mains = [item.main for item in items]
+        dt.extend([item.dt for item in items])
+        temp.extend([main.temp for main in mains])
+        temp_min.extend([main.temp_min for main in mains])
+        temp_max.extend([main.temp_max for main in mains])
+        icons.extend([item.weather[0].icon for item in items])
+        offsets.extend([data.city.timezone] * len(items))
+        city_idx.extend([i] * len(items))
+    return dt, offsets, temp, temp_min, temp_max, icons, city_idx
+
+
+def _aggregate_numpy(payloads, bucket, limit, icon_url):
+    width, shift = BUCKETS[bucket]
+    dt, offsets, temp, temp_min, temp_max, icons, city_idx = _columns(payloads)
+    results = [[] for _ in payloads]
+    if not dt:
+        return [()] * len(payloads)
+
+    local = np.asarray(dt, dtype=np.int64) + np.asarray(offsets, dtype=np.int64)
+    keys = (local - shift) // width
+    city_idx = np.asarray(city_idx, dtype=np.int64)
+
+    # Rows are sorted by city and, within a city, by time; a new group starts
+    # wherever the city or the bucket changes
+    order = np.lexsort((local, city_idx))
+    keys, city_idx = keys[order], city_idx[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(keys) != 0) | (np.diff(city_idx) != 0)])
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    temp = np.asarray(temp, dtype=np.float64)[order]
+    mins = np.minimum.reduceat(np.asarray(temp_min, dtype=np.float64)[order], starts)
+    maxs = np.maximum.reduceat(np.asarray(temp_max, dtype=np.float64)[order], starts)
+    means = np.add.reduceat(temp, starts) / counts
+
+    # Modal icon: count (group, icon) pairs in one 2D histogram, ties go to
+    # the icon seen first within the group
+    icon_names, icon_codes = np.unique(np.asarray(icons)[order], return_inverse=True)
+    icon_codes = icon_codes.ravel()
+    rows = len(keys)
+    group_of_row = np.repeat(np.arange(len(starts)), counts)
+    histogram = np.zeros((len(starts), len(icon_names)), dtype=np.int64)
+    np.add.at(histogram, (group_of_row, icon_codes), 1)
+    first_seen = np.full(histogram.shape, rows, dtype=np.int64)
+    np.minimum.at(first_seen, (group_of_row, icon_codes), np.arange(rows))
+    modal = (histogram * (rows + 1) - first_seen).argmax(axis=1)
+
+    # Convert once to Python lists, indexing NumPy scalars one by one is slow
+    group_city = city_idx[starts].tolist()
+    group_start = (keys[starts] * width + shift).tolist()
+    mins, maxs = np.round(mins).astype(np.int64).tolist(), np.round(maxs).astype(np.int64).tolist()
+    means = np.round(means, 1).tolist()
+    icon_urls = [icon_url.format(name) for name in icon_names.tolist()]
+    modal = modal.tolist()
+    labels = {}
+
+    for g in range(len(group_city)):
+        city = results[group_city[g]]
+        if limit is not None and len(city) >= limit:
+            continue
+        start = group_start[g]
+        label = labels.get(start)
+        if label is None:
+            label = labels[start] = _label(bucket, start)
+        city.append(ForecastDay(label, mins[g], maxs[g], means[g], icon_urls[modal[g]]))
+    return [tuple(forecast) for forecast in results]
+
+
+def _aggregate_python(payloads, bucket, limit, icon_url):
+    width, shift = BUCKETS[bucket]
+    results = []
+    for data in payloads:
+        offset = data.city.timezone
+        groups = {}
+        for item in data.list:
+            key = (item.dt + offset - shift) // width
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"min": float("inf"), "max": float("-inf"), "sum": 0.0, "n": 0, "icons": {}}
+            main = item.main
+            group["min"] = min(group["min"], main.temp_min)
+            group["max"] = max(group["max"], main.temp_max)
+            group["sum"] += main.temp
+            group["n"] += 1
+            icon = item.weather[0].icon
+            group["icons"][icon] = group["icons"].get(icon, 0) + 1
+
+        forecast = []
+        for key in sorted(groups)[:limit]:
+            group = groups[key]
+            icon = max(group["icons"], key=group["icons"].get)
+            forecast.append(ForecastDay(
+                _label(bucket, key * width + shift),
+                round(group["min"]),
+                round(group["max"]),
+                round(group["sum"] / group["n"], 1),
+                icon_url.format(icon),
+            ))
+        results.append(tuple(forecast))
+    return results
+
+
+def aggregate_many(payloads, bucket="day", limit=None, icon_url=ICON_URL):
+    """Aggregate several forecast payloads, api.payloads.Forecast records, in one pass.
+
+    Slots are grouped in each city's local time (the payload's `timezone`
+    offset) into `bucket` sized groups, see BUCKETS. Every group gets its
+    min, max and mean temperature and its most frequent icon. Returns one
+    tuple of ForecastDay records per payload, at most `limit` each.
+    `icon_url` is a format string turning an icon code into its URL.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown forecast bucket: {bucket}")
+    payloads = list(payloads)
+    # NumPy's fixed per-call overhead only pays off on larger batches
+    if USE_NUMPY and sum(len(data.list) for data in payloads) >= NUMPY_MIN_ROWS and _numpy() is not None:
+        with TELEMETRY.timer("forecast_aggregation", path="numpy"):
+            return _aggregate_numpy(payloads, bucket, limit, icon_url)
+    with TELEMETRY.timer("forecast_aggregation", path="python"):
+        return _aggregate_python(payloads, bucket, limit, icon_url)
+
+
+def aggregate(forecast_data, bucket="day", limit=None, icon_url=ICON_URL):
+    return aggregate_many([forecast_data], bucket, limit, icon_url)[0]
@@ -0,0 +1,365 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from config import Config
+from utils.telemetry import TELEMETRY
+from .models import decode, encode
+
+SCHEMA_VERSION = 2
+
+
+class WeatherCache:
+    """Persistent weather cache backed by SQLite.
+
+    Entries are stored per city and kind ("weather" or "forecast"), each kind
+    with its own TTL. A city is stored under its canonical location key: the
+    provider's city ID ("id:2643743"), else its rounded coordinates
+    ("geo:51.51,-0.13"), else its normalized name ("q:london"). Every method
+    taking a city also accepts what was asked for, a typed name, an ID or a
+    (lat, lon) pair: it is normalized to an alias ("London , GB" and
+    "london,gb" are both "q:london,gb") and looked up in the alias index,
+    which add_alias() fills once a response has told which city it was.
+
+    When more than `max_cities` cities are stored, the least recently used
+    ones are evicted, pinned cities never are. A single connection is shared
+    between threads and guarded by a lock. Decoded records of recently used
+    cities are also kept in memory so repeated lookups skip SQLite and JSON
+    decoding.
+    """
+
+    KINDS = ("weather", "forecast")
+
+    def __init__(self, path=None, ttls=None, max_cities=None):
+        self.path = path or Config.CACHE_DB
+        self.ttls = ttls or {
+            "weather": Config.CACHE_WEATHER_TTL,
+            "forecast": Config.CACHE_FORECAST_TTL,
+        }
+        self.max_cities = max_cities or Config.CACHE_MAX_CITIES
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # (city, kind) -> (record, updated)
+        self._touched = {}  # city -> last access not yet written to SQLite
+        self._aliases = OrderedDict()  # alias -> canonical key, also of unresolved aliases
+        self.reads = Counter()  # "memory", "disk" or "miss" -> lookups
+        self.alias_lookups = Counter()  # "resolved" or "unresolved" -> lookups
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                city TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (city, kind)
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cities (
+                city TEXT PRIMARY KEY,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pinned (
+                city TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                added REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS aliases (
+                alias TEXT PRIMARY KEY,
+                city TEXT NOT NULL
+            )"""
+        )
+        self._migrate()
+
+    def _migrate(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'schema'").fetchone()
+        version = int(row[0]) if row else 1
+        if version >= SCHEMA_VERSION:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            # Version 1 keyed cities by their normalized name, now an unresolved alias
+            for table in ("entries", "cities", "pinned"):
+                self._conn.execute(f"UPDATE {table} SET city = 'q:' || city WHERE city NOT LIKE '%:%'")
+            self._conn.execute(
+                "UPDATE meta SET value = 'q:' || value WHERE name = 'last_city' AND value NOT LIKE '%:%'"
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('schema', ?)", (str(SCHEMA_VERSION),)
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def normalize(city):
+        # "London , GB" -> "london,gb", "London," -> "london"
+        parts = (" ".join(part.split()) for part in city.lower().split(","))
+        return ",".join(part for part in parts if part)
+
+    @classmethod
+    def alias(cls, city):
+        """Alias of a lookup: a name, a city ID, a (lat, lon) pair or a key, which is its own alias."""
+        if isinstance(city, tuple):
+            return cls.location_key(lat=city[0], lon=city[1])
+        if isinstance(city, int) or city.isdigit():
+            return f"id:{int(city)}"
+        if city.startswith(("id:", "geo:", "q:")):
+            return city
+        return "q:" + cls.normalize(city)
+
+    @classmethod
+    def location_key(cls, city_id=None, lat=None, lon=None, name=None):
+        """Canonical key of a location from what a response says about it."""
+        if city_id:
+            return f"id:{city_id}"
+        if lat is not None and lon is not None:
+            # Two decimals, about a kilometre, a little GPS jitter maps to the same key
+            return f"geo:{lat:.2f},{lon:.2f}"
+        return "q:" + cls.normalize(name or "")
+
+    def key(self, city):
+        """Canonical key of `city`, its alias as long as the alias is not resolved."""
+        alias = self.alias(city)
+        if alias.startswith("id:"):
+            return alias
+        with self._lock:
+            return self._resolve(alias)
+
+    def _resolve(self, alias):
+        # Must be called with the lock held
+        key = self._aliases.get(alias)
+        if key is None:
+            row = self._conn.execute("SELECT city FROM aliases WHERE alias = ?", (alias,)).fetchone()
+            key = row[0] if row else alias
+            self._aliases[alias] = key
+            while len(self._aliases) > self.max_cities * 8:
+                self._aliases.popitem(last=False)
+        else:
+            self._aliases.move_to_end(alias)
+        result = "unresolved" if key == alias else "resolved"
+        self.alias_lookups[result] += 1
+        TELEMETRY.count("cache_aliases", result=result)
+        return key
+
+    def add_alias(self, city, key):
+        """Remember that lookups of `city` are answered by the city stored under `key`.
+
+        Whatever was stored under the alias itself, e.g. by an older version,
+        is dropped and a pin moves to the key.
+        """
+        alias = self.alias(city)
+        if alias == key:
+            return
+        with self._lock:
+            if self._aliases.get(alias) == key:
+                return
+            self._aliases[alias] = key
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO aliases (alias, city) VALUES (?, ?)", (alias, key))
+                self._conn.execute("DELETE FROM entries WHERE city = ?", (alias,))
+                self._conn.execute("DELETE FROM cities WHERE city = ?", (alias,))
+                self._conn.execute("UPDATE OR IGNORE pinned SET city = ? WHERE city = ?", (key, alias))
+                self._conn.execute("DELETE FROM pinned WHERE city = ?", (alias,))
+                self._conn.execute(
+                    "UPDATE meta SET value = ? WHERE name = 'last_city' AND value = ?", (key, alias)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            for kind in self.KINDS:
+                self._memory.pop((alias, kind), None)
+
+    def query_for(self, city):
+        """What to send the API for `city`: its city ID or coordinates once known, else the name."""
+        key = self.key(city)
+        if key.startswith("id:"):
+            return int(key[3:])
+        if key.startswith("geo:"):
+            lat, lon = key[4:].split(",")
+            return float(lat), float(lon)
+        if isinstance(city, str) and city.startswith("q:"):
+            return city[2:]
+        return city
+
+    def get(self, city, kind, allow_stale=False, max_age=None):
+        data, age = self.get_entry(city, kind)
+        if data is None:
+            return None
+        if not allow_stale and age >= (self.ttls[kind] if max_age is None else max_age):
+            return None
+        return data
+
+    def get_entry(self, city, kind):
+        """Return (data, age_in_seconds) ignoring the TTL, or (None, None)."""
+        alias = self.alias(city)
+        now = time.time()
+        with self._lock:
+            key = alias if alias.startswith("id:") else self._resolve(alias)
+            cached = self._memory.get((key, kind))
+            if cached is not None:
+                self._memory.move_to_end((key, kind))
+                self._touched[key] = now
+                self._count_read(kind, "memory")
+                return cached[0], now - cached[1]
+
+            row = self._conn.execute(
+                "SELECT data, updated FROM entries WHERE city = ? AND kind = ?",
+                (key, kind),
+            ).fetchone()
+            if row is None:
+                self._count_read(kind, "miss")
+                return None, None
+            self._conn.execute(
+                "UPDATE cities SET accessed = ? WHERE city = ?", (now, key)
+            )
+            record = decode(kind, json.loads(row[0]))
+            self._remember(key, kind, record, row[1])
+            self._count_read(kind, "disk")
+        return record, now - row[1]
+
+    def _count_read(self, kind, result):
+        self.reads[result] += 1
+        TELEMETRY.count("cache_reads", kind=kind, result=result)
+
+    def is_fresh(self, city, kind):
+        return self.get(city, kind) is not None
+
+    def set(self, city, kind, data, update_last_city=True):
+        key = self.key(city)
+        now = time.time()
+        payload = json.dumps(encode(kind, data))
+        with self._lock:
+            self._remember(key, kind, data, now)
+            self._conn.execute("BEGIN")
+            try:
+                self._flush_touched()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (city, kind, data, updated) VALUES (?, ?, ?, ?)",
+                    (key, kind, payload, now),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cities (city, accessed) VALUES (?, ?)", (key, now)
+                )
+                if update_last_city:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (name, value) VALUES ('last_city', ?)", (key,)
+                    )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def last_city(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'last_city'"
+            ).fetchone()
+        return row[0] if row else None
+
+    def pin(self, city):
+        key = self.key(city)
+        name = " ".join(city.split()) if isinstance(city, str) else key
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO pinned (city, name, added) VALUES (?, ?, ?)",
+                (key, name, time.time()),
+            )
+
+    def unpin(self, city):
+        key = self.key(city)
+        with self._lock:
+            self._conn.execute("DELETE FROM pinned WHERE city = ?", (key,))
+
+    def is_pinned(self, city):
+        key = self.key(city)
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM pinned WHERE city = ?", (key,)).fetchone()
+        return row is not None
+
+    def pinned(self):
+        """Keys of the pinned cities, in the order they were pinned."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT city FROM pinned ORDER BY added")]
+
+    def _remember(self, key, kind, record, updated):
+        # Must be called with the lock held
+        self._memory[(key, kind)] = (record, updated)
+        self._memory.move_to_end((key, kind))
+        while len(self._memory) > self.max_cities * len(self.KINDS):
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        # Must be called with the lock held
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cities SET accessed = ? WHERE city = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        # Must be called with the lock held
+        count = self._conn.execute("SELECT COUNT(*) FROM cities").fetchone()[0]
+        excess = count - self.max_cities
+        if excess <= 0:
+            return
+        stale = [
+            row[0] for row in self._conn.execute(
+                "SELECT city FROM cities WHERE city NOT IN (SELECT city FROM pinned) "
+                "ORDER BY accessed ASC LIMIT ?",
+                (excess,),
+            )
+        ]
+        self._conn.executemany("DELETE FROM entries WHERE city = ?", [(c,) for c in stale])
+        self._conn.executemany("DELETE FROM cities WHERE city = ?", [(c,) for c in stale])
+        self._conn.executemany("DELETE FROM aliases WHERE city = ?", [(c,) for c in stale])
+        for key in stale:
+            for kind in self.KINDS:
+                self._memory.pop((key, kind), None)
+        stale = set(stale)
+        for alias in [alias for alias, key in self._aliases.items() if key in stale]:
+            del self._aliases[alias]
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._aliases.clear()
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM cities")
+            self._conn.execute("DELETE FROM aliases")
+
+    def stats(self):
+        reads = sum(self.reads.values())
+        aliases = sum(self.alias_lookups.values())
+        return {
+            "reads": reads,
+            "hit_ratio": (reads - self.reads["miss"]) / reads if reads else None,
+            "memory_hits": self.reads["memory"],
+            "disk_hits": self.reads["disk"],
+            "alias_lookups": aliases,
+            "aliases_resolved": self.alias_lookups["resolved"] / aliases if aliases else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
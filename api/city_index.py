@@ -0,0 +1,388 @@
+"""Local index of the provider's city list, for suggestions and name lookups.
+
+Built once from OpenWeatherMap's city.list.json.gz (about 200k cities) into
+a single file that is memory-mapped when opened, so nothing is parsed up
+front and only the pages a lookup touches are read:
+
+    python main.py --city-index build [city.list.json.gz or URL]
+    python main.py --city-index search lond
+
+The file is a header followed by column arrays, uint32 unless noted:
+
+    ids, coords (float32 lat, lon), countries and states (2 bytes each)
+    key_offs + keys        normalized names, records are sorted by key
+    name_offs + names      display names, UTF-8
+    tri_codes + tri_offs + postings
+                           records whose key contains each trigram
+
+Prefix lookups binary search the sorted keys, misspelled names are matched
+by counting shared trigrams. Arrays are in native byte order: the index is
+a local cache, not an exchange format.
+"""
+import argparse
+import bisect
+import gzip
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import Counter
+from config import Config
+from .models import City
+
+MAGIC = b"WCIX"
+VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+SECTIONS = (
+    "ids", "coords", "countries", "states", "key_offs", "keys",
+    "name_offs", "names", "tri_codes", "tri_offs", "postings",
+)
+HEADER = struct.Struct("=4sIII" + "II" * len(SECTIONS))
+
+# Prefix matches up to this many are ranked shortest name first, so "lon"
+# suggests London before Londonderry, larger ranges stay alphabetical
+RANK_LIMIT = 2000
+# Trigram postings counted per fuzzy lookup, rarest trigrams first
+FUZZY_BUDGET = 8000
+# Minimum Jaccard similarity of the trigram sets for a fuzzy match
+FUZZY_MIN_SCORE = 0.2
+
+_index = None
+_index_checked = False
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    """Search key of a name: accents removed, case folded, punctuation collapsed to single spaces."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return " ".join("".join(c if c.isalnum() else " " for c in folded).split())
+
+
+def trigram_codes(key):
+    padded = f" {key} "
+    return {zlib.crc32(padded[i:i + 3].encode()) for i in range(len(padded) - 2)}
+
+
+def read_city_list(source):
+    """Load the provider's city list from a path or URL, gzipped or not."""
+    if source.startswith(("http://", "https://")):
+        from . import transport
+
+        # A multi-megabyte download, the interactive deadlines are far too short.
+        # `timeout` is the read timeout, connecting is still capped at HTTP_CONNECT_TIMEOUT
+        response = transport.get(source, deadline=300, timeout=60)
+        if response.status_code != 200:
+            raise OSError(f"Downloading {source} failed: {response.status_code}")
+        raw = response.content
+    else:
+        with open(source, "rb") as f:
+            raw = f.read()
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    return json.loads(raw)
+
+
+def _code(text):
+    # Country and state codes are stored in two bytes
+    return text.encode("ascii", "replace")[:2].ljust(2)
+
+
+def build(cities, path=None):
+    """Write the index of `cities`, dicts as in city.list.json, to `path`. Returns the city count.
+
+    The file is written next to `path` and moved into place, an index that
+    is open meanwhile keeps reading the old one.
+    """
+    path = path or Config.CITY_INDEX_FILE
+    rows = []
+    for city in cities:
+        key = normalize(city["name"])
+        if key:
+            coord = city.get("coord") or {}
+            rows.append((
+                key, city["id"], city["name"], city.get("country") or "", city.get("state") or "",
+                coord.get("lat", 0.0), coord.get("lon", 0.0),
+            ))
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    columns = {
+        "ids": array("I"), "coords": array("f"), "countries": bytearray(), "states": bytearray(),
+        "key_offs": array("I", [0]), "keys": bytearray(), "name_offs": array("I", [0]), "names": bytearray(),
+    }
+    postings_by_code = {}
+    for i, (key, city_id, name, country, state, lat, lon) in enumerate(rows):
+        columns["ids"].append(city_id)
+        columns["coords"].extend((lat, lon))
+        columns["countries"] += _code(country)
+        columns["states"] += _code(state)
+        columns["keys"] += key.encode()
+        columns["key_offs"].append(len(columns["keys"]))
+        columns["names"] += name.encode()
+        columns["name_offs"].append(len(columns["names"]))
+        for code in trigram_codes(key):
+            postings = postings_by_code.get(code)
+            if postings is None:
+                postings = postings_by_code[code] = array("I")
+            postings.append(i)
+
+    columns["tri_codes"] = array("I", sorted(postings_by_code))
+    columns["tri_offs"] = array("I", [0])
+    columns["postings"] = array("I")
+    for code in columns["tri_codes"]:
+        columns["postings"].extend(postings_by_code[code])
+        columns["tri_offs"].append(len(columns["postings"]))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            table = []
+            offset = HEADER.size
+            f.write(b"\0" * HEADER.size)
+            for name in SECTIONS:
+                data = bytes(columns[name]) if isinstance(columns[name], bytearray) else columns[name].tobytes()
+                # Every section starts 4-byte aligned so it can be cast in place
+                padding = -offset % 4
+                f.write(b"\0" * padding)
+                offset += padding
+                f.write(data)
+                table.extend((offset, len(data)))
+                offset += len(data)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(rows), *table))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(rows)
+
+
+class _Keys:
+    """Sequence view of the sorted keys as bytes, for bisect."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class CityIndex:
+    """Read-only view of a built index file, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            view = self._view(memoryview(self._mmap))
+            if len(view) < HEADER.size:
+                raise ValueError(f"Not a city index: {path}")
+            magic, version, mark, self.count, *table = HEADER.unpack_from(view)
+            if magic != MAGIC or version != VERSION or mark != BYTE_ORDER_MARK:
+                raise ValueError(f"Not a city index, or built by another version: {path}")
+            sections = {
+                name: self._view(view[offset:offset + length])
+                for name, offset, length in zip(SECTIONS, table[0::2], table[1::2])
+            }
+            self._ids = self._view(sections["ids"].cast("I"))
+            self._coords = self._view(sections["coords"].cast("f"))
+            self._countries = sections["countries"]
+            self._states = sections["states"]
+            self._key_offs = self._view(sections["key_offs"].cast("I"))
+            self._names = sections["names"]
+            self._name_offs = self._view(sections["name_offs"].cast("I"))
+            self._tri_codes = self._view(sections["tri_codes"].cast("I"))
+            self._tri_offs = self._view(sections["tri_offs"].cast("I"))
+            self._postings = self._view(sections["postings"].cast("I"))
+            self._keys = _Keys(self._key_offs, sections["keys"])
+        except Exception:
+            self.close()
+            raise
+
+    def _view(self, view):
+        # Every view is released on close(), the mmap cannot close while one is alive
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+
+    def __len__(self):
+        return self.count
+
+    def city(self, row):
+        lat, lon = self._coords[2 * row], self._coords[2 * row + 1]
+        return City(
+            id=self._ids[row],
+            name=self._names[self._name_offs[row]:self._name_offs[row + 1]].tobytes().decode(),
+            country=self._countries[2 * row:2 * row + 2].tobytes().decode().strip(),
+            state=self._states[2 * row:2 * row + 2].tobytes().decode().strip(),
+            lat=round(lat, 4),
+            lon=round(lon, 4),
+        )
+
+    def _key_length(self, row):
+        return self._key_offs[row + 1] - self._key_offs[row]
+
+    def _prefix_rows(self, key, limit):
+        prefix = key.encode()
+        lo = bisect.bisect_left(self._keys, prefix)
+        # No UTF-8 sequence contains 0xff, every key starting with prefix sorts below this
+        hi = bisect.bisect_left(self._keys, prefix + b"\xff", lo)
+        if hi - lo <= limit:
+            return list(range(lo, hi))
+        if hi - lo <= RANK_LIMIT:
+            offsets = self._key_offs[lo:hi + 1]
+            lengths = [end - start for start, end in zip(offsets, offsets[1:])]
+            return [lo + i for i in heapq.nsmallest(limit, range(hi - lo), key=lengths.__getitem__)]
+        return list(range(lo, lo + limit))
+
+    def _fuzzy_rows(self, key, limit):
+        # Typos rarely hit the first letter, so candidates are the names
+        # sharing it: a contiguous range of rows, which every posting list
+        # is cut down to before counting
+        first = key[0].encode()
+        lo = bisect.bisect_left(self._keys, first)
+        hi = bisect.bisect_left(self._keys, first + b"\xff", lo)
+        codes = trigram_codes(key)
+        postings = []
+        for code in codes:
+            i = bisect.bisect_left(self._tri_codes, code)
+            if i < len(self._tri_codes) and self._tri_codes[i] == code:
+                rows = self._postings[self._tri_offs[i]:self._tri_offs[i + 1]]
+                postings.append(rows[bisect.bisect_left(rows, lo):bisect.bisect_left(rows, hi)])
+        postings.sort(key=len)
+
+        counts = Counter()
+        budget = FUZZY_BUDGET
+        for rows in postings:
+            if len(rows) > budget:
+                break
+            counts.update(rows)
+            budget -= len(rows)
+
+        scored = []
+        for row, shared in counts.most_common(limit * 8):
+            # A key has as many padded trigrams as characters, repeats aside
+            score = shared / (len(codes) + self._key_length(row) - shared)
+            if score >= FUZZY_MIN_SCORE:
+                scored.append((-score, row))
+        return [row for _, row in sorted(scored)[:limit]]
+
+    def search(self, text, limit=8):
+        """Cities for a partially typed name: prefix matches, then similar names.
+
+        Similar names fill up the result when fewer than `limit` names start
+        with `text`, so "lodnon" still suggests London. Only names with the
+        same first letter count as similar.
+        """
+        key = normalize(text)
+        if not key:
+            return []
+        rows = self._prefix_rows(key, limit)
+        if len(rows) < limit and len(key) >= 3:
+            rows += [row for row in self._fuzzy_rows(key, limit) if row not in rows][:limit - len(rows)]
+
+        cities, labels = [], set()
+        for row in rows:
+            city = self.city(row)
+            # The list has some cities twice, under separate IDs
+            if city.label not in labels:
+                labels.add(city.label)
+                cities.append(city)
+        return cities
+
+    def resolve(self, text):
+        """The one city `text` names, or None if it names none or several.
+
+        `text` is a name optionally followed by state and country codes, as
+        in City.label: "Paris", "Paris, FR", "Springfield, IL, US".
+        """
+        name, *qualifiers = (part.strip() for part in text.split(","))
+        qualifiers = [part.upper().encode() for part in qualifiers if part]
+        key = normalize(name).encode()
+        if not key:
+            return None
+
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key, lo)
+        matches = [
+            row for row in range(lo, hi)
+            if all(q in (self._countries[2 * row:2 * row + 2], self._states[2 * row:2 * row + 2]) for q in qualifiers)
+        ]
+        if len(matches) != 1:
+            return None
+        return self.city(matches[0])
+
+
+def get_index():
+    """Return the process-wide index, or None if none has been built."""
+    global _index, _index_checked
+    if not _index_checked:
+        with _index_lock:
+            if not _index_checked:
+                if os.path.exists(Config.CITY_INDEX_FILE):
+                    try:
+                        _index = CityIndex(Config.CITY_INDEX_FILE)
+                    except (OSError, ValueError) as e:
+                        print(f"City index unavailable: {e}")
+                _index_checked = True
+    return _index
+
+
+def reset_index():
+    """Close the process-wide index, the next get_index() opens the file again."""
+    global _index, _index_checked
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = None
+        _index_checked = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py --city-index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build the index from the provider's city list")
+    build_parser.add_argument("source", nargs="?", default=Config.CITY_LIST_URL, help="path or URL of city.list.json[.gz]")
+    build_parser.add_argument("--output", default=Config.CITY_INDEX_FILE)
+    search_parser = commands.add_parser("search", help="print the suggestions for a name")
+    search_parser.add_argument("text")
+    search_parser.add_argument("--limit", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        try:
+            count = build(read_city_list(args.source), args.output)
+        except Exception as e:
+            print(f"Could not build the city index: {e}")
+            return 1
+        size = os.path.getsize(args.output)
+        print(f"Indexed {count} cities in {time.perf_counter() - start:.1f} s, {size / 1e6:.1f} MB: {args.output}")
+        return 0
+
+    index = get_index()
+    if index is None:
+        print(f"No city index at {Config.CITY_INDEX_FILE}, run `python main.py --city-index build` first")
+        return 1
+    for city in index.search(args.text, args.limit):
+        print(f"{city.id:>10}  {city.label}  ({city.lat}, {city.lon})")
+    return 0
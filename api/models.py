@@ -0,0 +1,90 @@
+from dataclasses import asdict, dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class CurrentWeather:
+    temperature: int
+    description: str
+    humidity: int
+    wind_speed: float
+    icon_url: str
+    city_name: str
+    country: str = ""
+    # Provider city ID and coordinates, what the cache keys the city by
+    city_id: int = None
+    lat: float = None
+    lon: float = None
+
+
+@dataclass(frozen=True, slots=True)
+class ForecastDay:
+    """Aggregated forecast for one bucket, usually a day in the city's local time."""
+
+    date: str
+    temp_min: int
+    temp_max: int
+    temp_mean: float
+    icon_url: str
+
+
+@dataclass(frozen=True, slots=True)
+class ForecastSlot:
+    """One 3-hourly entry of the raw forecast."""
+
+    dt: int
+    temperature: float
+    temp_min: float
+    temp_max: float
+    humidity: int
+    wind_speed: float
+    description: str
+    icon: str
+
+
+@dataclass(frozen=True, slots=True)
+class GeoLocation:
+    city: str
+    country: str = ""
+    lat: float = None
+    lon: float = None
+    provider: str = ""
+
+    @property
+    def coords(self):
+        if self.lat is None or self.lon is None:
+            return None
+        return (self.lat, self.lon)
+
+
+@dataclass(frozen=True, slots=True)
+class City:
+    """One entry of the provider's city list, see api.city_index."""
+
+    id: int
+    name: str
+    country: str = ""
+    state: str = ""
+    lat: float = None
+    lon: float = None
+
+    @property
+    def label(self):
+        # "Springfield, IL, US", the text shown in suggestions
+        return ", ".join(part for part in (self.name, self.state, self.country) if part)
+
+
+def to_dict(record):
+    return asdict(record)
+
+
+def encode(kind, data):
+    # Plain JSON compatible structure for the persistent cache
+    if kind == "forecast":
+        return [asdict(day) for day in data]
+    return asdict(data)
+
+
+def decode(kind, raw):
+    if kind == "forecast":
+        return tuple(ForecastDay(**day) for day in raw)
+    return CurrentWeather(**raw)
@@ -0,0 +1,283 @@
+"""Typed decoding of the provider's JSON responses.
+
+Only the fields the app reads are declared, everything else in a response
+is skipped without being materialised. Responses are validated against the
+declared types on the way in: a missing field or a wrong type raises
+PayloadError naming where in the document it is, e.g.
+"Malformed forecast payload: Expected `int`, got `str` - at `$.list[3].dt`".
+
+msgspec is optional. Without it the stdlib json module parses the response
+and a decoder compiled from the same declarations validates and converts
+it, with the same results and messages.
+"""
+import dataclasses
+import json
+import types
+import typing
+from utils.telemetry import TELEMETRY
+
+try:
+    import msgspec
+except ImportError:  # Stdlib fallback, same results
+    msgspec = None
+
+USE_MSGSPEC = True
+
+
+class PayloadError(ValueError):
+    """A response that is not valid JSON or does not match the expected schema."""
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Coord:
+    lat: float
+    lon: float
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Conditions:
+    """One entry of a response's "weather" list."""
+
+    description: str
+    icon: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Wind:
+    speed: float
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Main:
+    temp: float
+    humidity: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SlotMain:
+    temp: float
+    temp_min: float
+    temp_max: float
+    humidity: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Sys:
+    country: str = ""
+
+
+def _check_conditions(record):
+    if not record.weather:
+        raise ValueError("Expected at least one `weather` entry")
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Current:
+    """Response of the current weather endpoint."""
+
+    main: Main
+    weather: tuple[Conditions, ...]
+    wind: Wind
+    name: str
+    sys: Sys = Sys()
+    id: int = 0
+    coord: Coord | None = None
+
+    __post_init__ = _check_conditions
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Slot:
+    """One 3-hourly entry of a forecast response."""
+
+    dt: int
+    main: SlotMain
+    weather: tuple[Conditions, ...]
+    wind: Wind
+
+    __post_init__ = _check_conditions
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ForecastCity:
+    id: int = 0
+    name: str = ""
+    country: str = ""
+    timezone: int = 0  # Offset from UTC in seconds
+    coord: Coord | None = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Forecast:
+    """Response of the forecast endpoint."""
+
+    list: tuple[Slot, ...]
+    city: ForecastCity = ForecastCity()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Group:
+    """Response of the group endpoint, current weather for several city IDs."""
+
+    list: tuple[Current, ...] = ()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Combined:
+    """Response of a combined endpoint, see Config.COMBINED_URL."""
+
+    current: Current
+    forecast: Forecast
+
+
+class _Invalid(Exception):
+    # Raised by the fallback converters, the path is filled in on the way out
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+        self.path = []
+
+
+def _kind(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return type(value).__name__
+
+
+_converters = {}
+
+
+def _converter(schema):
+    converter = _converters.get(schema)
+    if converter is None:
+        converter = _converters[schema] = _compile(schema)
+    return converter
+
+
+def _compile(schema):
+    # Returns a function checking a parsed JSON value against `schema` and
+    # turning it into the declared type
+    if dataclasses.is_dataclass(schema):
+        return _compile_record(schema)
+
+    origin, args = typing.get_origin(schema), typing.get_args(schema)
+    if origin is tuple:  # tuple[X, ...]
+        item = _converter(args[0])
+
+        def convert_array(value):
+            if not isinstance(value, list):
+                raise _Invalid(f"Expected `array`, got `{_kind(value)}`")
+            result = []
+            for i, element in enumerate(value):
+                try:
+                    result.append(item(element))
+                except _Invalid as e:
+                    e.path.append(f"[{i}]")
+                    raise
+            return tuple(result)
+        return convert_array
+
+    if origin is types.UnionType:  # X | None
+        inner = _converter(next(arg for arg in args if arg is not type(None)))
+        return lambda value: None if value is None else inner(value)
+
+    if schema is float:
+        def convert_float(value):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+            raise _Invalid(f"Expected `float`, got `{_kind(value)}`")
+        return convert_float
+
+    def convert_scalar(value):
+        if type(value) is schema:
+            return value
+        raise _Invalid(f"Expected `{schema.__name__}`, got `{_kind(value)}`")
+    return convert_scalar
+
+
+def _compile_record(schema):
+    fields = []
+    for field in dataclasses.fields(schema):
+        required = field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING
+        fields.append((field.name, _converter(field.type), required))
+
+    def convert_record(value):
+        if not isinstance(value, dict):
+            raise _Invalid(f"Expected `object`, got `{_kind(value)}`")
+        kwargs = {}
+        for name, convert, required in fields:
+            if name in value:
+                try:
+                    kwargs[name] = convert(value[name])
+                except _Invalid as e:
+                    e.path.append(f".{name}")
+                    raise
+            elif required:
+                raise _Invalid(f"Object missing required field `{name}`")
+        try:
+            return schema(**kwargs)
+        except ValueError as e:
+            raise _Invalid(str(e)) from None
+    return convert_record
+
+
+def _convert_python(obj, schema):
+    try:
+        return _converter(schema)(obj)
+    except _Invalid as e:
+        path = "".join(reversed(e.path))
+        raise _error(schema, e.message + (f" - at `${path}`" if path else "")) from None
+
+
+def _error(schema, detail):
+    return PayloadError(f"Malformed {schema.__name__.lower()} payload: {detail}")
+
+
+_decoders = {}
+
+
+def _msgspec_decoder(schema):
+    decoder = _decoders.get(schema)
+    if decoder is None:
+        decoder = _decoders[schema] = msgspec.json.Decoder(schema)
+    return decoder
+
+
+def _use_msgspec():
+    return USE_MSGSPEC and msgspec is not None
+
+
+def decode(raw, schema):
+    """Decode a JSON document, bytes or str, into `schema`, one of the record types above.
+
+    Raises PayloadError when `raw` is not JSON or does not match the schema.
+    """
+    if _use_msgspec():
+        with TELEMETRY.timer("payload_decode", path="msgspec"):
+            try:
+                return _msgspec_decoder(schema).decode(raw)
+            except (msgspec.DecodeError, msgspec.ValidationError) as e:
+                raise _error(schema, str(e)) from None
+
+    with TELEMETRY.timer("payload_decode", path="python"):
+        try:
+            obj = json.loads(raw)
+        except ValueError as e:
+            raise _error(schema, f"JSON is malformed: {e}") from None
+        return _convert_python(obj, schema)
+
+
+def convert(obj, schema):
+    """Like decode, for a document already parsed into dicts and lists."""
+    if _use_msgspec():
+        try:
+            return msgspec.convert(obj, schema)
+        except msgspec.ValidationError as e:
+            raise _error(schema, str(e)) from None
+    return _convert_python(obj, schema)
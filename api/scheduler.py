@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from config import Config
+from . import transport
+from .transport import TransportError
+
+# Priority classes, lower goes first
+INTERACTIVE = 0  # the user is waiting on the result
+BATCH = 1  # multi-city lookups
+BACKGROUND = 2  # refreshes nobody asked for
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class QuotaExceeded(TransportError):
+    """The call cannot be made within its deadline without exceeding the quota."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value, default=None):
+    """Seconds to wait from a Retry-After header, either delta-seconds or an HTTP date."""
+    default = Config.API_RETRY_AFTER if default is None else default
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class QuotaScheduler:
+    """Admit API calls at the rate the key's quota allows.
+
+    A token bucket refills at `per_minute` calls per minute up to `burst`.
+    Waiting calls are served by priority class first and round-robin across
+    keys (cities) within a class, so one city with many queued calls cannot
+    starve the others. Calls below INTERACTIVE leave `reserve` tokens in the
+    bucket, a search typed by the user never queues behind a refresh. A 429
+    empties the bucket and holds every call until Retry-After has passed.
+    """
+
+    def __init__(self, per_minute=None, burst=None, reserve=None):
+        self.rate = (per_minute or Config.API_CALLS_PER_MINUTE) / 60.0
+        self.capacity = burst or Config.API_BURST
+        self.reserve = Config.API_INTERACTIVE_RESERVE if reserve is None else reserve
+        self.reserve = min(self.reserve, self.capacity - 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}  # priority -> key -> tickets
+        self._cond = threading.Condition()
+        self.granted = {priority: 0 for priority in PRIORITIES}
+        self.waited = {priority: 0.0 for priority in PRIORITIES}
+        self.throttled = 0
+        self.rejected = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _head(self):
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _dequeue(self, priority, key, ticket):
+        queue = self._queues[priority]
+        tickets = queue.get(key)
+        if tickets is None or ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        if tickets:
+            # Round robin: this key goes behind every other waiting key
+            queue.move_to_end(key)
+        else:
+            del queue[key]
+
+    def acquire(self, priority=INTERACTIVE, key=None, deadline=None):
+        """Block until a call may be made, return the seconds spent waiting.
+
+        Raises QuotaExceeded when no token can be had within `deadline`
+        seconds, immediately if that is already known.
+        """
+        start = time.monotonic()
+        end = start + (Config.HTTP_DEADLINE if deadline is None else deadline)
+        need = 1 if priority == INTERACTIVE else 1 + self.reserve
+        ticket = object()
+        with self._cond:
+            self._queues[priority].setdefault(key, deque()).append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    remaining = end - now
+                    self._refill(now)
+                    if self._head() is ticket:
+                        wait = max(self.blocked_until - now, (need - self.tokens) / self.rate)
+                        if wait <= 0:
+                            self.tokens -= 1
+                            self._dequeue(priority, key, ticket)
+                            waited = now - start
+                            self.granted[priority] += 1
+                            self.waited[priority] += waited
+                            return waited
+                        if wait > remaining:
+                            self.rejected += 1
+                            raise QuotaExceeded("API quota exhausted, try again shortly", retry_after=wait)
+                        self._cond.wait(wait)
+                    else:
+                        if remaining <= 0:
+                            self.rejected += 1
+                            raise QuotaExceeded("API quota exhausted, try again shortly")
+                        self._cond.wait(remaining)
+            finally:
+                self._dequeue(priority, key, ticket)
+                self._cond.notify_all()
+
+    def throttle(self, retry_after):
+        """The provider answered 429, hold every call for `retry_after` seconds."""
+        with self._cond:
+            self.throttled += 1
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self._cond.notify_all()
+
+    def get(self, url, priority=INTERACTIVE, key=None, deadline=None, **kwargs):
+        """transport.get() admitted by the quota, retrying after a 429 while the deadline allows.
+
+        Every request sent counts against the quota, each retry and hedged
+        copy transport makes takes its own token.
+        """
+        end = time.monotonic() + (Config.HTTP_DEADLINE if deadline is None else deadline)
+
+        def admit(timeout):
+            self.acquire(priority, key, timeout)
+
+        while True:
+            response = transport.get(url, deadline=max(end - time.monotonic(), 0.001), admit=admit, **kwargs)
+            if response.status_code != 429:
+                return response
+            self.throttle(parse_retry_after(response.headers.get("Retry-After")))
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self.tokens, 2),
+                "queued": sum(len(tickets) for queue in self._queues.values() for tickets in queue.values()),
+                "granted": dict(self.granted),
+                "mean_wait": {
+                    priority: self.waited[priority] / self.granted[priority] if self.granted[priority] else 0.0
+                    for priority in PRIORITIES
+                },
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+            }
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, the quota belongs to the key, not to a service."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = QuotaScheduler()
+    return _scheduler
@@ -0,0 +1,347 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+from config import Config
+from utils.telemetry import TELEMETRY
+
+_session = None
+_session_lock = threading.Lock()
+_hedge_pool = None
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+# Statuses worth another attempt, the provider is overloaded or a proxy gave up
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+
+counters = {"requests": 0, "retries": 0, "hedges": 0, "rejected": 0}
+
+
+class TransportError(Exception):
+    """A request that produced no usable response."""
+    retryable = False
+
+
+class ConnectionFailed(TransportError):
+    # The connection was never established, so nothing reached the server
+    retryable = True
+
+
+class TransportTimeout(TransportError):
+    retryable = True
+
+
+class DeadlineExceeded(TransportError):
+    """The call ran out of time budget before it could get an answer."""
+
+
+class CircuitOpenError(TransportError):
+    """The host failed repeatedly and is not contacted until its circuit resets."""
+
+
+class CircuitBreaker:
+    """Fail fast for a host that keeps failing.
+
+    After `threshold` consecutive failures the circuit opens and every call is
+    rejected without touching the network for `reset_after` seconds. Then a
+    single probe is let through, its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, threshold=None, reset_after=None):
+        self.threshold = threshold or Config.HTTP_BREAKER_THRESHOLD
+        self.reset_after = reset_after or Config.HTTP_BREAKER_RESET
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+def _timed_adapter_class():
+    """An HTTPAdapter whose connections report DNS and connect times to TELEMETRY."""
+    import socket
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedConnectionMixin:
+        def _new_conn(self):
+            # Resolve separately to time DNS, then connect to the first address
+            host = self._dns_host
+            start = time.perf_counter()
+            try:
+                addresses = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+            except OSError:
+                addresses = None
+            TELEMETRY.observe("http_dns", time.perf_counter() - start, host=self.host)
+            if not addresses:
+                return super()._new_conn()
+
+            start = time.perf_counter()
+            self._dns_host = addresses[0][4][0]
+            try:
+                sock = super()._new_conn()
+            except Exception:
+                # Let urllib3 try every address itself
+                self._dns_host = host
+                sock = super()._new_conn()
+            finally:
+                self._dns_host = host
+            TELEMETRY.observe("http_tcp_connect", time.perf_counter() - start, host=self.host)
+            return sock
+
+        def connect(self):
+            # TCP plus the TLS handshake for HTTPS
+            start = time.perf_counter()
+            super().connect()
+            TELEMETRY.observe("http_connect", time.perf_counter() - start, host=self.host)
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool,
+                "https": TimedHTTPSConnectionPool,
+            }
+
+    return TimedHTTPAdapter
+
+
+def create_session(pool_size=None):
+    """Create a keep-alive session with a connection pool of `pool_size` per host."""
+    # requests is imported on first use, it is not needed to draw the window
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    pool_size = pool_size or Config.HTTP_POOL_SIZE
+    session = requests.Session()
+    adapter_class = _timed_adapter_class() if TELEMETRY.enabled else HTTPAdapter
+    adapter = adapter_class(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide session shared by every service and worker thread."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def reset_session(pool_size=None):
+    """Close the shared session and replace it, e.g. to change the pool size."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_size)
+        _breakers.clear()
+    return _session
+
+
+def get_breaker(url):
+    host = urlsplit(url).netloc
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(host, CircuitBreaker())
+    return breaker
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _session_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=Config.HTTP_POOL_SIZE, thread_name_prefix="hedge")
+    return _hedge_pool
+
+
+def _send(method, url, timeout, kwargs):
+    import requests
+
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        if TELEMETRY.enabled:
+            host = urlsplit(url).hostname
+            # elapsed runs from sending the request to parsing the headers
+            TELEMETRY.observe("http_ttfb", response.elapsed.total_seconds(), host=host)
+            TELEMETRY.observe("http_total", time.perf_counter() - start, host=host)
+            TELEMETRY.count("http_responses", host=host, status=response.status_code)
+        return response
+    except requests.exceptions.RequestException as e:
+        host = urlsplit(url).netloc
+        TELEMETRY.count("http_errors", host=urlsplit(url).hostname, error=type(e).__name__)
+        if isinstance(e, requests.exceptions.ConnectTimeout):
+            raise ConnectionFailed(f"Timed out connecting to {host}") from e
+        if isinstance(e, requests.exceptions.Timeout):
+            raise TransportTimeout(f"No response from {host} within {timeout[1]:.1f}s") from e
+        if isinstance(e, requests.exceptions.ConnectionError):
+            raise ConnectionFailed(f"Could not connect to {host}") from e
+        raise TransportError(str(e)) from e
+
+
+def _admitted_now(admit):
+    # A hedged copy is only worth sending if it can go out right away
+    if admit is None:
+        return True
+    try:
+        admit(0)
+        return True
+    except TransportError:
+        return False
+
+
+def _send_hedged(method, url, timeout, hedge_after, kwargs, admit=None):
+    # A second copy goes out if the first is slow, whichever answers first wins.
+    # The loser cannot be cancelled but its own timeout bounds it.
+    pool = _get_hedge_pool()
+    pending = {pool.submit(_send, method, url, timeout, kwargs)}
+    done, _ = wait(pending, timeout=hedge_after)
+    if not done and _admitted_now(admit):
+        counters["hedges"] += 1
+        pending.add(pool.submit(_send, method, url, timeout, kwargs))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result()
+            except TransportError as e:
+                error = e
+    raise error
+
+
+def backoff_delay(attempt):
+    """Full jitter: a random wait up to the exponential backoff for `attempt`."""
+    return random.uniform(0, min(Config.HTTP_BACKOFF_MAX, Config.HTTP_BACKOFF * 2 ** attempt))
+
+
+def request(method, url, deadline=None, retries=None, hedge_after=None, timeout=None, admit=None, **kwargs):
+    """Send a request within a deadline, retrying transient failures.
+
+    `deadline` is the time budget in seconds for the whole call including
+    retries and backoff, `timeout` optionally caps each attempt. Connection
+    failures are always retried, timeouts and 5xx responses only for
+    idempotent methods. Raises a TransportError subclass when no response
+    could be obtained, otherwise returns the last response, whatever its
+    status, for the caller to interpret.
+
+    `admit`, if given, is called with the seconds left before every attempt
+    and every hedged copy is sent. It blocks until that request may go out or
+    raises a TransportError, see QuotaScheduler.get. A hedged copy is only
+    sent if it is admitted at once.
+    """
+    method = method.upper()
+    idempotent = method in IDEMPOTENT_METHODS
+    retries = Config.HTTP_RETRIES if retries is None else retries
+    hedge_after = Config.HTTP_HEDGE_AFTER if hedge_after is None else hedge_after
+    connect_timeout = min(timeout or Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_CONNECT_TIMEOUT)
+    read_timeout = timeout or Config.HTTP_READ_TIMEOUT
+    end = time.monotonic() + (deadline or Config.HTTP_DEADLINE)
+    breaker = get_breaker(url)
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            counters["rejected"] += 1
+            raise CircuitOpenError(f"{urlsplit(url).netloc} is unavailable, retrying in a moment")
+
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Request to {urlsplit(url).netloc} ran out of time")
+        if admit is not None:
+            admit(remaining)
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Request to {urlsplit(url).netloc} ran out of time")
+        attempt_timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+
+        counters["requests"] += 1
+        response = error = None
+        try:
+            if hedge_after and idempotent and hedge_after < attempt_timeout[1]:
+                response = _send_hedged(method, url, attempt_timeout, hedge_after, kwargs, admit)
+            else:
+                response = _send(method, url, attempt_timeout, kwargs)
+        except TransportError as e:
+            error = e
+
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            breaker.record_success()
+            return response
+        breaker.record_failure()
+
+        if error is not None:
+            retryable = isinstance(error, ConnectionFailed) or (error.retryable and idempotent)
+        else:
+            retryable = idempotent
+        delay = backoff_delay(attempt)
+        if not retryable or attempt >= retries or time.monotonic() + delay >= end:
+            if error is not None:
+                raise error
+            return response
+
+        attempt += 1
+        counters["retries"] += 1
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def stats():
+    return {
+        **counters,
+        "open_circuits": sorted(host for host, breaker in _breakers.items() if breaker.state != "closed"),
+    }
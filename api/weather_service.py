@@ -1,6 +1,41 @@
-import requests
-from datetime import datetime
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from config import Config
+from . import aggregation, city_index, payloads, scheduler
+from .models import CurrentWeather, ForecastSlot
+from .payloads import PayloadError
+
+
+class WeatherServiceError(Exception):
+    pass
+
+
+class CityNotFoundError(WeatherServiceError):
+    pass
+
+
+def run_bounded(fn, items, max_workers):
+    """Call fn(item) for every item with at most `max_workers` calls in flight.
+
+    Yields (item, result, error) tuples in completion order, error being the
+    exception fn raised, if any. `items` is consumed lazily, only as fast as
+    calls complete.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        item_iter = iter(items)
+        futures = {executor.submit(fn, item): item for item in islice(item_iter, max_workers)}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = futures.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+
+            for item in islice(item_iter, len(done)):
+                futures[executor.submit(fn, item)] = item
 
 
 class WeatherService:
@@ -8,102 +43,293 @@ class WeatherService:
         self.api_key = Config.OPENWEATHER_API_KEY
         self.base_url = "http://api.openweathermap.org/data/2.5/weather"
         self.base_url_forecast = "http://api.openweathermap.org/data/2.5/forecast"
+        self.base_url_group = "http://api.openweathermap.org/data/2.5/group"
+        self.group_size = 20  # Max IDs per group request
+        self.max_workers = Config.BATCH_CONCURRENCY
+        self.combined_url = Config.COMBINED_URL
+        self.icon_base_url = Config.ICON_BASE_URL
         self.units = "metric"
         self.lang = "en"
+        self.forecast_bucket = "day"
+        self.forecast_days = 5
+        self.single_request = Config.SINGLE_REQUEST
+        self.max_skew = Config.SINGLE_REQUEST_MAX_SKEW
+        # Every API call is admitted by the shared quota scheduler
+        self.scheduler = scheduler.get_scheduler()
+        self.priority = scheduler.INTERACTIVE
+        # Resolves typed names to city IDs, None until the index is built
+        self.city_index = city_index.get_index()
+
+    def query(self, city):
+        # Coordinate pairs are sent as lat=/lon=, numeric city IDs as id=,
+        # names the city index resolves to a single city by its ID, anything
+        # else as a free text name
+        if isinstance(city, tuple):
+            lat, lon = city
+            return f"lat={lat:.4f}&lon={lon:.4f}"
+        if isinstance(city, int) or (isinstance(city, str) and city.isdigit()):
+            return f"id={city}"
+        if self.city_index is not None:
+            match = self.city_index.resolve(city)
+            if match is not None:
+                return f"id={match.id}"
+        return f"q={city}"
+
+    def api_get(self, url, key=None, priority=None):
+        return self.scheduler.get(url, priority=self.priority if priority is None else priority, key=key)
 
     def get_weather_data(self, city):
         try:
-            current_response = requests.get(
-                f"{self.base_url}?q={city}&appid={self.api_key}&units={self.units}&lang={self.lang}"
-                
+            return self.fetch_current(city)
+
+        except (WeatherServiceError, PayloadError) as e:
+            print(e)
+            return None
+        except Exception as e:
+            print(f"Error fetching weather data:{e}")
+            return None
+
+    def fetch_current(self, city, priority=None):
+        current_response = self.api_get(
+            f"{self.base_url}?{self.query(city)}&appid={self.api_key}&units={self.units}&lang={self.lang}",
+            key=city, priority=priority,
+        )
+
+        if current_response.status_code == 404:
+            raise CityNotFoundError("City not found")
+
+        if current_response.status_code != 200:
+            raise WeatherServiceError(f"Error fetching weather data: {current_response.status_code}")
+
+        return self.parse_current(payloads.decode(current_response.content, payloads.Current))
+
+    def fetch_group(self, city_ids, priority=None):
+        # Returns {city_id: current} for the IDs the provider knows about
+        ids = ",".join(str(city_id) for city_id in city_ids)
+        response = self.api_get(
+            f"{self.base_url_group}?id={ids}&appid={self.api_key}&units={self.units}&lang={self.lang}",
+            key=ids, priority=priority,
+        )
+
+        if response.status_code != 200:
+            raise WeatherServiceError(f"Error fetching weather data: {response.status_code}")
+
+        group = payloads.decode(response.content, payloads.Group)
+        return {item.id: self.parse_current(item) for item in group.list}
+
+    def get_weather_many(self, cities, max_workers=None):
+        """Fetch the current weather for many cities, yielding results as they arrive.
+
+        Yields (city, current, error) tuples in completion order, where exactly
+        one of current and error is set. Numeric city IDs are batched through
+        the group endpoint, names are fetched with at most `max_workers`
+        requests in flight. `cities` may be any iterable, it is consumed lazily
+        so memory stays flat for long inputs. Calls are scheduled as BATCH, an
+        interactive lookup made meanwhile goes ahead of them.
+        """
+        max_workers = max_workers or self.max_workers
+        pending_ids = []
+
+        def jobs():
+            for city in cities:
+                if isinstance(city, int) or (isinstance(city, str) and city.isdigit()):
+                    pending_ids.append(int(city))
+                    if len(pending_ids) == self.group_size:
+                        yield ("group", pending_ids[:])
+                        pending_ids.clear()
+                else:
+                    yield ("city", city)
+            if pending_ids:
+                yield ("group", pending_ids[:])
+
+        def run(job):
+            kind, target = job
+            if kind == "city":
+                return [(target, self.fetch_current(target, priority=scheduler.BATCH))]
+            results = self.fetch_group(target, priority=scheduler.BATCH)
+            return [(city_id, results.get(city_id)) for city_id in target]
+
+        for (kind, target), results, error in run_bounded(run, jobs(), max_workers):
+            if error is not None:
+                for city in (target if kind == "group" else [target]):
+                    yield city, None, str(error)
+                continue
+            for city, current in results:
+                if current is None:
+                    yield city, None, "City not found"
+                else:
+                    yield city, current, None
+
+    def get_bundle_many(self, cities, max_workers=None):
+        """Fetch current weather and forecast for many cities, yielding results as they arrive.
+
+        Like get_weather_many, but yields (city, (current, forecast), error)
+        tuples. Only in single request mode or with a combined endpoint do
+        cities go through fetch_bundle, otherwise current weather and forecast
+        are fetched separately, as the GUI does. Calls are scheduled at the
+        service's own priority.
+        """
+        fetch = self.fetch_bundle if self.single_request or self.combined_url else self.fetch_separately
+        for city, bundle, error in run_bounded(fetch, cities, max_workers or self.max_workers):
+            yield city, bundle, None if error is None else str(error)
+
+    def wind_speed(self, speed):
+        # km/h from the m/s metric units report, imperial (mph) and standard (m/s) as sent
+        if self.units == "metric":
+            speed *= 3.6
+        return round(speed, 1)
+
+    def parse_current(self, current_data):
+        # current_data is a payloads.Current record, see api.payloads
+        conditions = current_data.weather[0]
+        coord = current_data.coord
+        return CurrentWeather(
+            temperature=round(current_data.main.temp),
+            description=conditions.description.capitalize(),
+            humidity=current_data.main.humidity,
+            wind_speed=self.wind_speed(current_data.wind.speed),
+            icon_url=f"{self.icon_base_url}/{conditions.icon}@2x.png",
+            city_name=current_data.name,
+            country=current_data.sys.country,
+            city_id=current_data.id or None,
+            lat=coord.lat if coord else None,
+            lon=coord.lon if coord else None,
+        )
+
+    def parse_slots(self, forecast_data):
+        return tuple(
+            ForecastSlot(
+                dt=item.dt,
+                temperature=item.main.temp,
+                temp_min=item.main.temp_min,
+                temp_max=item.main.temp_max,
+                humidity=item.main.humidity,
+                wind_speed=self.wind_speed(item.wind.speed),
+                description=item.weather[0].description.capitalize(),
+                icon=item.weather[0].icon,
             )
+            for item in forecast_data.list
+        )
+
+    def get_forecast_data(self, city):
+        try:
+            return self.fetch_forecast_days(city)
+
+        except PayloadError as e:
+            print(e)
+            return ()
+        except Exception as e:
+            print(f"Error al obtener datos del pronóstico: {str(e)}")
+            return ()
+
+    def get_forecast_slots(self, city):
+        # Pronóstico sin agrupar, un registro cada 3 horas
+        try:
+            return self.parse_slots(self.fetch_forecast(city))
+
+        except PayloadError as e:
+            print(e)
+            return ()
+        except Exception as e:
+            print(f"Error al obtener datos del pronóstico: {str(e)}")
+            return ()
+
+    def fetch_forecast(self, city):
+        forecast_response = self.api_get(
+            f"{self.base_url_forecast}?{self.query(city)}&appid={self.api_key}&units={self.units}&lang={self.lang}&cnt=40",
+            key=city,
+        )
+
+        if forecast_response.status_code == 404:
+            raise CityNotFoundError("City not found")
+
+        if forecast_response.status_code != 200:
+            raise WeatherServiceError(f"Error fetching forecast data: {forecast_response.status_code}")
 
-            if current_response.status_code == 404:
-                print("City not found")
-                return None
+        return payloads.decode(forecast_response.content, payloads.Forecast)
 
-            if current_response.status_code != 200:
-                print(f"Error fetching weather data: {current_response.status_code}")
-                return None
-            
-            current_data = current_response.json()
+    def fetch_forecast_days(self, city):
+        return self.aggregate_forecast(self.fetch_forecast(city))
 
-            current = {
-                "temperature": round(current_data["main"]["temp"]),
-                "description": current_data["weather"][0]["description"].capitalize(),
-                "humidity": current_data["main"]["humidity"],
-                "wind_speed": round(current_data["wind"]["speed"] * 3.6, 1 ),
-                "icon_url": f"http://openweathermap.org/img/wn/{current_data['weather'][0]['icon']}@2x.png",
-                "city_name": current_data["name"],
-                "country": current_data["sys"].get("country", "")
-            }
+    def aggregate_forecast(self, forecast_data):
+        # Agrupar pronósticos por día en la hora local de la ciudad
+        return aggregation.aggregate(
+            forecast_data, bucket=self.forecast_bucket, limit=self.forecast_days,
+            icon_url=f"{self.icon_base_url}/{{}}.png",
+        )
 
-            return current
+    def current_from_forecast(self, forecast_data):
+        # El primer bloque del pronóstico sirve como condiciones actuales
+        if not forecast_data.list:
+            return None
+
+        first = forecast_data.list[0]
+        if abs(first.dt - time.time()) > self.max_skew:
+            return None
+
+        city = forecast_data.city
+        return self.parse_current(payloads.Current(
+            main=payloads.Main(temp=first.main.temp, humidity=first.main.humidity),
+            weather=first.weather,
+            wind=first.wind,
+            name=city.name,
+            sys=payloads.Sys(country=city.country),
+            id=city.id,
+            coord=city.coord,
+        ))
 
+    def get_weather_bundle(self, city):
+        try:
+            return self.fetch_bundle(city)
+
+        except PayloadError as e:
+            print(e)
+            return None, ()
         except Exception as e:
             print(f"Error fetching weather data:{e}")
-            return None
-        
-    def get_forecast_data(self, city):
+            return None, ()
+
+    def fetch_separately(self, city):
+        """Return (current, forecast) for a city from their own endpoints."""
+        current = self.fetch_current(city)
         try:
-            forecast_response = requests.get(
-                f"{self.base_url_forecast}?q={city}&appid={self.api_key}&units={self.units}&lang={self.lang}&cnt=40"
+            forecast = self.fetch_forecast_days(city)
+        except Exception as e:
+            # The current weather alone is still worth showing
+            print(f"Error fetching forecast data: {e}")
+            forecast = ()
+        return current, forecast
+
+    def fetch_bundle(self, city):
+        """Return (current, forecast) for a city using as few requests as possible.
+
+        With a combined endpoint configured a single request returns both
+        payloads. Otherwise the forecast is fetched and its first slot is used
+        as the current conditions, falling back to the current weather endpoint
+        only when that slot is too far from now to count as fresh.
+        """
+        if self.combined_url:
+            response = self.api_get(
+                f"{self.combined_url}?{self.query(city)}&appid={self.api_key}&units={self.units}&lang={self.lang}",
+                key=city,
             )
+            if response.status_code == 404:
+                raise CityNotFoundError("City not found")
+            if response.status_code != 200:
+                raise WeatherServiceError(f"Error fetching weather data: {response.status_code}")
+            data = payloads.decode(response.content, payloads.Combined)
+            return self.parse_current(data.current), self.aggregate_forecast(data.forecast)
 
-            if forecast_response.status_code != 200:
-                return []
-            
-            forecast_data = forecast_response.json()
-            
-            # Agrupar pronósticos por día
-            daily_forecasts = {}
-            
-            for item in forecast_data["list"]:
-                dt = datetime.fromtimestamp(item["dt"])
-                day_str = dt.strftime("%Y-%m-%d")
-                
-                # Inicializar entrada para este día si no existe
-                if day_str not in daily_forecasts:
-                    daily_forecasts[day_str] = {
-                        "date": dt.strftime("%a %d"),
-                        "temp_min": float('9999'),  # Un valor alto inicial
-                        "temp_max": float('-9999'),  # Un valor bajo inicial
-                        "icon": None,
-                        "icon_count": {},  # Para contar ocurrencias de cada icono
-                    }
-                
-                # Actualizar mínimo y máximo
-                temp = item["main"]["temp"]
-                daily_forecasts[day_str]["temp_min"] = min(daily_forecasts[day_str]["temp_min"], item["main"]["temp_min"])
-                daily_forecasts[day_str]["temp_max"] = max(daily_forecasts[day_str]["temp_max"], item["main"]["temp_max"])
-                
-                # Contar ocurrencias de cada icono
-                icon = item['weather'][0]['icon']
-                if icon not in daily_forecasts[day_str]["icon_count"]:
-                    daily_forecasts[day_str]["icon_count"][icon] = 0
-                daily_forecasts[day_str]["icon_count"][icon] += 1
-            
-            # Convertir el diccionario a una lista y seleccionar el icono más frecuente para cada día
-            forecast = []
-            for day_str, day_data in sorted(daily_forecasts.items())[:5]:  # Limitar a 5 días
-                # Encontrar el icono más frecuente
-                if day_data["icon_count"]:
-                    most_common_icon = max(day_data["icon_count"].items(), key=lambda x: x[1])[0]
-                    day_data["icon_url"] = f"http://openweathermap.org/img/wn/{most_common_icon}.png"
-                
-                # Redondear temperaturas
-                day_data["temp_min"] = round(day_data["temp_min"])
-                day_data["temp_max"] = round(day_data["temp_max"])
-                
-                # Eliminar datos temporales
-                day_data.pop("icon_count", None)
-                day_data.pop("icon", None)
-                
-                forecast.append(day_data)
-            
-            return forecast
-            
+        try:
+            forecast_data = self.fetch_forecast(city)
+        except CityNotFoundError:
+            raise
         except Exception as e:
-            print(f"Error al obtener datos del pronóstico: {str(e)}")
-            return []
-        
\ No newline at end of file
+            # The current weather alone is still worth showing
+            print(f"Error fetching forecast data: {e}")
+            return self.fetch_current(city), ()
+
+        current = self.current_from_forecast(forecast_data)
+        if current is None:
+            current = self.fetch_current(city)
+        return current, self.aggregate_forecast(forecast_data)
@@ -0,0 +1,54 @@
+"""Run the offline benchmark suite and optionally compare it with a baseline.
+
+From the repository root:
+
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --compare baseline.json [--tolerance 0.15]
+
+Each benchmark runs in its own process so Qt and Config start clean. Exits
+with status 1 when a metric regressed by more than the tolerance.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from benchmarks import harness
+
+SUITE = (
+    ("service", ["benchmarks.bench_service"]),
+    ("city switch", ["benchmarks.bench_city_switch"]),
+    ("city index", ["benchmarks.bench_city_index"]),
+    ("decoding", ["benchmarks.bench_decoding"]),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline written by an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    results = {}
+    for name, command in SUITE:
+        print(f"Running {name}...", file=sys.stderr)
+        output = subprocess.run(
+            [sys.executable, "-m", *command, "--json", "-"], check=True, capture_output=True, text=True
+        ).stdout
+        # The JSON document is the last line, anything before it is the app's own logging
+        results.update(json.loads(output.strip().splitlines()[-1]))
+
+    if args.save:
+        harness.save(results, args.save)
+
+    if args.compare:
+        regressions = harness.compare(results, harness.load(args.compare), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s)", file=sys.stderr)
+            sys.exit(1)
+    else:
+        harness.report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Forecast aggregation: the original per-item loop vs api.aggregation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_aggregation [--cities 500] [--repeat 5]
+"""
+import argparse
+import copy
+import json
+import os
+import time
+from datetime import datetime
+from api import aggregation, payloads
+from benchmarks.stub_server import PAYLOAD_DIR
+
+
+def legacy_aggregate(forecast_data):
+    # The loop get_forecast_data used before the aggregation engine
+    daily_forecasts = {}
+    for item in forecast_data["list"]:
+        dt = datetime.fromtimestamp(item["dt"])
+        day_str = dt.strftime("%Y-%m-%d")
+        if day_str not in daily_forecasts:
+            daily_forecasts[day_str] = {
+                "date": dt.strftime("%a %d"),
+                "temp_min": float('9999'),
+                "temp_max": float('-9999'),
+                "icon": None,
+                "icon_count": {},
+            }
+        daily_forecasts[day_str]["temp_min"] = min(daily_forecasts[day_str]["temp_min"], item["main"]["temp_min"])
+        daily_forecasts[day_str]["temp_max"] = max(daily_forecasts[day_str]["temp_max"], item["main"]["temp_max"])
+        icon = item['weather'][0]['icon']
+        if icon not in daily_forecasts[day_str]["icon_count"]:
+            daily_forecasts[day_str]["icon_count"][icon] = 0
+        daily_forecasts[day_str]["icon_count"][icon] += 1
+
+    forecast = []
+    for day_str, day_data in sorted(daily_forecasts.items())[:5]:
+        if day_data["icon_count"]:
+            most_common_icon = max(day_data["icon_count"].items(), key=lambda x: x[1])[0]
+            day_data["icon_url"] = f"http://openweathermap.org/img/wn/{most_common_icon}.png"
+        day_data["temp_min"] = round(day_data["temp_min"])
+        day_data["temp_max"] = round(day_data["temp_max"])
+        day_data.pop("icon_count", None)
+        day_data.pop("icon", None)
+        forecast.append(day_data)
+    return forecast
+
+
+def make_payloads(n):
+    with open(os.path.join(PAYLOAD_DIR, "forecast.json")) as f:
+        template = json.load(f)
+    payloads = []
+    for i in range(n):
+        data = copy.deepcopy(template)
+        data["city"]["timezone"] = ((i % 27) - 12) * 3600
+        for item in data["list"]:
+            item["main"]["temp"] += i % 7
+        payloads.append(data)
+    return payloads
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dicts = make_payloads(args.cities)
+    records = [payloads.convert(data, payloads.Forecast) for data in dicts]
+    results = {
+        "legacy loop": best_of(args.repeat, lambda: [legacy_aggregate(p) for p in dicts]),
+        "aggregate (per city)": best_of(args.repeat, lambda: [aggregation.aggregate(p, limit=5) for p in records]),
+        "aggregate_many": best_of(args.repeat, lambda: aggregation.aggregate_many(records, limit=5)),
+    }
+    if aggregation.np is not None:
+        aggregation.USE_NUMPY = False
+        try:
+            results["aggregate_many (pure python)"] = best_of(
+                args.repeat, lambda: aggregation.aggregate_many(records, limit=5)
+            )
+        finally:
+            aggregation.USE_NUMPY = True
+
+    baseline = results["legacy loop"]
+    print(f"{args.cities} cities x 40 slots, best of {args.repeat}")
+    for name, seconds in results.items():
+        print(f"{name:<30} {seconds * 1000:9.2f} ms   {baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Build and lookup cost of the local city index (api.city_index).
+
+Without a source the index is built from a generated list the size of the
+provider's (200k cities, seeded, so every run indexes the same names),
+downloaded gzipped from the local stub server the way `main.py --city-index
+build` fetches the real one, with the first attempt failing so the retry is
+exercised too. Pass the real city.list.json.gz to measure that instead. From
+the repository root:
+
+    python -m benchmarks.bench_city_index [--source city.list.json.gz] [--json results.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from api.city_index import CityIndex, build, read_city_list
+from benchmarks import harness
+from benchmarks.stub_server import StubServer
+
+# Syllables are onset + vowel + coda, a few thousand combinations, so names
+# share trigrams about as much as real place names do
+ONSETS = ("", "b", "br", "c", "ch", "d", "f", "g", "gr", "h", "j", "k", "l", "m", "n", "p", "pr", "r", "s", "st", "t", "tr", "v", "w", "z")
+VOWELS = ("a", "e", "i", "o", "u", "ai", "ea", "ou", "y")
+CODAS = ("", "", "", "n", "r", "s", "l", "m", "rg", "nd", "st", "x", "t")
+COUNTRIES = ("US", "GB", "DE", "FR", "ES", "IT", "BR", "IN", "CN", "RU", "MX", "JP", "AR", "PL", "CA")
+STATES = ("CA", "TX", "NY", "FL", "IL", "OH", "WA", "GA")
+
+
+def syllable(rng):
+    return rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+
+
+def synthetic_cities(count=200_000, seed=0):
+    rng = random.Random(seed)
+    cities = []
+    for i in range(count):
+        name = "".join(syllable(rng) for _ in range(rng.randint(2, 3))).title()
+        if rng.random() < 0.1:
+            name = f"{name} {syllable(rng).title()}"
+        country = rng.choice(COUNTRIES)
+        cities.append({
+            "id": 1_000_000 + i,
+            "name": name,
+            "state": rng.choice(STATES) if country == "US" else "",
+            "country": country,
+            "coord": {"lat": rng.uniform(-60, 70), "lon": rng.uniform(-180, 180)},
+        })
+    return cities
+
+
+def misspell(name, rng):
+    # Swap two neighbouring letters, the most common typo
+    i = rng.randrange(len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def download(cities):
+    """Fetch `cities` through read_city_list from the stub server, return (cities, seconds)."""
+    path = "/sample/city.list.json.gz"
+    with StubServer() as server:
+        server.serve(path, gzip.compress(json.dumps(cities).encode()))
+        server.add_fault(path, status=503, count=1)
+        start = time.perf_counter()
+        downloaded = read_city_list(server.url + path)
+        elapsed = time.perf_counter() - start
+    if downloaded != cities:
+        raise AssertionError("The city list downloaded from the stub server differs from the one served")
+    return downloaded, elapsed
+
+
+def timed(call, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        call(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(source=None, lookups=2000, seed=0):
+    rng = random.Random(seed)
+    results = {}
+    if source:
+        cities = read_city_list(source)
+    else:
+        cities, elapsed = download(synthetic_cities(seed=seed))
+        results["city list download"] = harness.metric(elapsed, "s")
+    names = [city["name"] for city in rng.sample(cities, min(lookups, len(cities)))]
+
+    with tempfile.TemporaryDirectory(prefix="weather-bench-") as tmp:
+        path = os.path.join(tmp, "cities.idx")
+        start = time.perf_counter()
+        build(cities, path)
+        results["city index build"] = harness.metric(time.perf_counter() - start, "s")
+        results["city index size"] = harness.metric(os.path.getsize(path) / 1e6, "MB")
+
+        start = time.perf_counter()
+        index = CityIndex(path)
+        results["city index open"] = harness.metric((time.perf_counter() - start) * 1000, "ms")
+
+        for length in (1, 3, 5):
+            prefixes = [name[:length] for name in names]
+            results.update(harness.latency_metrics(f"city search [prefix {length}]", timed(index.search, prefixes)))
+        long_names = [name for name in names if len(name) >= 5]
+        typos = [misspell(name, rng) for name in long_names]
+        results.update(harness.latency_metrics("city search [typo]", timed(index.search, typos)))
+        found = sum(
+            any(city.name == name for city in index.search(typo))
+            for name, typo in zip(long_names, typos)
+        )
+        results["city search [typo] recall"] = harness.metric(100 * found / len(typos), "%", better="higher")
+        results.update(harness.latency_metrics("city resolve", timed(index.resolve, names)))
+        index.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", help="path or URL of the provider's city.list.json[.gz]")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file, - for stdout")
+    args = parser.parse_args()
+
+    results = run(args.source, args.lookups, args.seed)
+    if args.json == "-":
+        print(json.dumps(results))
+        return
+    harness.report(results)
+    if args.json:
+        harness.save(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
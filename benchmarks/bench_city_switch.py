@@ -0,0 +1,121 @@
+"""End-to-end city switch latency of WeatherGUI against the local stub server.
+
+Measures from get_weather_for_city() until the lookup has finished and the
+window has repainted, for cold switches (empty cache, every city fetched
+over HTTP), warm ones (cache hits) and warm ones typed differently
+("london", "LONDON ", "London,"), which the cache's alias index should
+still answer. Also reports the cache hit ratio of those lookups. Runs
+offline under the offscreen Qt platform with a throwaway cache directory,
+from the repository root:
+
+    python -m benchmarks.bench_city_switch [--rounds 5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Before anything reads Config: a private cache and no background work
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["WEATHER_CACHE_DIR"] = tempfile.mkdtemp(prefix="weather-bench-")
+os.environ["WEATHER_PINNED_REFRESH"] = "0"
+
+from PyQt6.QtCore import QEventLoop, QTimer
+from PyQt6.QtWidgets import QApplication
+from benchmarks import harness
+from benchmarks.stub_server import StubServer
+
+CITIES = ("London", "Paris", "Berlin", "Madrid", "Rome", "Vienna", "Prague", "Lisbon")
+
+
+def switch(window, city, timeout=10.0):
+    """Switch `window` to `city`, return the seconds until the result is painted."""
+    loop = QEventLoop()
+    alias = window.weather_cache.alias(city)
+
+    def on_finished(finished):
+        if window.weather_cache.alias(finished) == alias:
+            loop.quit()
+
+    window.weather_requests.finished.connect(on_finished)
+    start = time.perf_counter()
+    window.get_weather_for_city(city)
+    if window.weather_requests.in_flight():
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(loop.quit)
+        timer.start(int(timeout * 1000))
+        loop.exec()
+        timer.stop()
+    window.repaint()
+    elapsed = time.perf_counter() - start
+    window.weather_requests.finished.disconnect(on_finished)
+    return elapsed
+
+
+def run(rounds=5, latency=0.02, jitter=0.005, seed=0):
+    random.seed(seed)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    import gui.workers
+    from gui.main_window import WeatherGUI
+
+    with StubServer(latency=latency, jitter=jitter, seed=seed) as server:
+        class StubWeatherService(gui.workers.WeatherService):
+            def __init__(self):
+                super().__init__()
+                server.configure(self)
+
+        gui.workers.WeatherService = StubWeatherService
+        # No IP lookup: its error dialog would block the offscreen event loop
+        WeatherGUI.show_ip_weather = lambda self: None
+
+        window = WeatherGUI()
+        window.show()
+        app.processEvents()
+
+        cold, warm, variants = [], [], []
+        switch(window, "Warmup")
+        for _ in range(rounds):
+            window.weather_cache.clear()
+            server.reset(seed)
+            cold.extend(switch(window, city) for city in CITIES)
+            warm.extend(switch(window, city) for city in CITIES)
+            before = window.weather_cache.stats()
+            for spell in (str.lower, str.upper, lambda city: f" {city}, "):
+                variants.extend(switch(window, spell(city)) for city in CITIES)
+            after = window.weather_cache.stats()
+        window.close()
+
+    reads = after["reads"] - before["reads"]
+    hits = (after["memory_hits"] + after["disk_hits"]) - (before["memory_hits"] + before["disk_hits"])
+    results = {}
+    results.update(harness.latency_metrics("city switch [cold]", cold))
+    results.update(harness.latency_metrics("city switch [warm]", warm))
+    results.update(harness.latency_metrics("city switch [respelled]", variants))
+    results["cache hit ratio [respelled]"] = harness.metric(100 * hits / reads, "%", better="higher")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub server latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file, - for stdout")
+    args = parser.parse_args()
+
+    results = run(args.rounds, args.latency, seed=args.seed)
+    if args.json == "-":
+        print(json.dumps(results))
+        return
+    harness.report(results)
+    if args.json:
+        harness.save(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
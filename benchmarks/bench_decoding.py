@@ -0,0 +1,107 @@
+"""Decoding the provider's responses: response.json() dicts vs api.payloads.
+
+Decodes the recorded payloads, bytes as they come off the wire: the current
+weather into CurrentWeather, the 40-slot forecast into the document that is
+then aggregated. Compares the nested dicts the service used before with the
+typed decoder, through msgspec when it is installed and its stdlib
+fallback, by time per document and by the memory a decoded forecast holds
+until it is aggregated. From the repository root:
+
+    python -m benchmarks.bench_decoding [--repeat 2000] [--json results.json]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from api import payloads
+from api.models import CurrentWeather
+from api.weather_service import WeatherService
+from benchmarks import harness
+from benchmarks.stub_server import PAYLOAD_DIR
+
+
+def legacy_current(raw):
+    # What get_weather_data did before api.payloads
+    data = json.loads(raw)
+    return CurrentWeather(
+        temperature=round(data["main"]["temp"]),
+        description=data["weather"][0]["description"].capitalize(),
+        humidity=data["main"]["humidity"],
+        wind_speed=round(data["wind"]["speed"] * 3.6, 1),
+        icon_url=f"http://openweathermap.org/img/wn/{data['weather'][0]['icon']}@2x.png",
+        city_name=data["name"],
+        country=data["sys"].get("country", ""),
+        city_id=data.get("id") or None,
+        lat=data.get("coord", {}).get("lat"),
+        lon=data.get("coord", {}).get("lon"),
+    )
+
+
+def per_document(call, raw, repeat):
+    # Best of five runs, in microseconds per document
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call(raw)
+        best = min(best, time.perf_counter() - start)
+    return best / repeat * 1e6
+
+
+def retained(decode, raw, count=200):
+    # Memory held by `count` decoded documents, in KB per document
+    tracemalloc.start()
+    documents = [decode(raw) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del documents
+    return size / count / 1024
+
+
+def run(repeat=2000):
+    with open(os.path.join(PAYLOAD_DIR, "weather.json"), "rb") as f:
+        weather = f.read()
+    with open(os.path.join(PAYLOAD_DIR, "forecast.json"), "rb") as f:
+        forecast = f.read()
+
+    service = WeatherService()
+    typed = (
+        lambda raw: service.parse_current(payloads.decode(raw, payloads.Current)),
+        lambda raw: payloads.decode(raw, payloads.Forecast),
+    )
+    results = {}
+
+    def measure(label, current, document):
+        results[f"decode weather [{label}]"] = harness.metric(per_document(current, weather, repeat), "us")
+        results[f"decode forecast [{label}]"] = harness.metric(per_document(document, forecast, repeat // 10), "us")
+        results[f"decoded forecast size [{label}]"] = harness.metric(retained(document, forecast), "KB")
+
+    measure("json", legacy_current, json.loads)
+    if payloads.msgspec is not None:
+        measure("msgspec", *typed)
+    payloads.USE_MSGSPEC = False
+    try:
+        measure("stdlib", *typed)
+    finally:
+        payloads.USE_MSGSPEC = True
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000, help="current weather documents per run, a tenth as many forecasts")
+    parser.add_argument("--json", help="write the results to this file, - for stdout")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.json == "-":
+        print(json.dumps(results))
+        return
+    harness.report(results)
+    if args.json:
+        harness.save(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""City switch cost of the forecast grid, rebuilding widgets vs reusing them.
+
+Runs under the offscreen Qt platform. From the repository root:
+
+    python -m benchmarks.bench_forecast_grid [--switches 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication, QLabel, QSizePolicy, QWidget
+from api import payloads
+from api.weather_service import WeatherService
+from benchmarks.stub_server import PAYLOAD_DIR
+
+
+def legacy_update(gui, current_forecast):
+    # The rebuild-everything update_forecast_display the pool replaced
+    for i in reversed(range(gui.forecast_grid.count())):
+        widget = gui.forecast_grid.itemAt(i).widget()
+        if widget:
+            widget.setParent(None)
+
+    for i, item in enumerate(current_forecast, 1):
+        date_label = QLabel(item.date)
+        date_label.setObjectName("forecast_date")
+        date_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        min_temp_label = QLabel(f"{item.temp_min}°C")
+        min_temp_label.setObjectName("weather_value")
+        min_temp_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        max_temp_label = QLabel(f"{item.temp_max}°C")
+        max_temp_label.setObjectName("weather_value")
+        max_temp_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        forecast_icon = QLabel()
+        forecast_icon.setObjectName("forecast_icon")
+        forecast_icon.setMinimumSize(70, 70)
+        forecast_icon.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        if gui.is_dark_mode:
+            for widget in [date_label, min_temp_label, max_temp_label, forecast_icon]:
+                widget.setProperty("darkMode", "true")
+                widget.style().unpolish(widget)
+                widget.style().polish(widget)
+
+        for widget in [date_label, min_temp_label, max_temp_label, forecast_icon]:
+            widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
+
+        gui.forecast_grid.addWidget(date_label, 0, i)
+        gui.forecast_grid.addWidget(max_temp_label, 1, i)
+        gui.forecast_grid.addWidget(min_temp_label, 2, i)
+        gui.forecast_grid.addWidget(forecast_icon, 3, i)
+
+    for widget in gui.findChildren(QWidget, "forecast_container"):
+        widget.setProperty("darkMode", "true" if gui.is_dark_mode else "false")
+        widget.style().unpolish(widget)
+        widget.style().polish(widget)
+        widget.update()
+
+
+def forecasts():
+    with open(os.path.join(PAYLOAD_DIR, "forecast.json")) as f:
+        payload = json.load(f)
+    service = WeatherService()
+    first = service.aggregate_forecast(payloads.convert(payload, payloads.Forecast))
+    for item in payload["list"]:
+        item["main"]["temp_min"] -= 3
+        item["main"]["temp_max"] += 2
+    return first, service.aggregate_forecast(payloads.convert(payload, payloads.Forecast))
+
+
+def run(app, gui, update, switches, dark):
+    gui.is_dark_mode = dark
+    a, b = forecasts()
+    update(a)
+    app.processEvents()
+    start = time.perf_counter()
+    for i in range(switches):
+        update(b if i % 2 == 0 else a)
+        app.processEvents()
+    return (time.perf_counter() - start) / switches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--switches", type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from gui.main_window import WeatherGUI
+    # No IP lookup: its error dialog would block the offscreen event loop
+    WeatherGUI.show_ip_weather = lambda self: None
+
+    for dark in (False, True):
+        legacy_gui = WeatherGUI()
+        legacy_gui.show()
+        legacy = run(app, legacy_gui, lambda f: legacy_update(legacy_gui, f), args.switches, dark)
+        legacy_gui.close()
+
+        pooled_gui = WeatherGUI()
+        pooled_gui.show()
+        pooled = run(app, pooled_gui, pooled_gui.update_forecast_display, args.switches, dark)
+        pooled_gui.close()
+
+        mode = "dark " if dark else "light"
+        print(f"{mode}  rebuild {legacy * 1000:7.3f} ms/switch   pooled {pooled * 1000:7.3f} ms/switch   "
+              f"{legacy / pooled:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
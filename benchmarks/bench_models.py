@@ -0,0 +1,81 @@
+"""Memory held by cached cities, free-form dicts vs the slotted record types.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_models [--cities 5000]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import asdict
+from api import payloads
+from api.weather_service import WeatherService
+from benchmarks.stub_server import PAYLOAD_DIR
+
+
+def load(name):
+    with open(os.path.join(PAYLOAD_DIR, name)) as f:
+        return json.load(f)
+
+
+def build_cache(n, weather_payload, forecast_payload, as_dicts):
+    service = WeatherService()
+    cache = {}
+    for i in range(n):
+        weather_payload["main"]["temp"] = 10 + i % 20
+        weather_payload["name"] = f"City {i}"
+        current = service.parse_current(payloads.convert(weather_payload, payloads.Current))
+        forecast = service.aggregate_forecast(payloads.convert(forecast_payload, payloads.Forecast))
+        if as_dicts:
+            cache[current.city_name] = {
+                "weather": asdict(current),
+                "forecast": [asdict(day) for day in forecast],
+            }
+        else:
+            cache[current.city_name] = (current, forecast)
+    return cache
+
+
+def measure(n, as_dicts):
+    weather_payload, forecast_payload = load("weather.json"), load("forecast.json")
+    tracemalloc.start()
+    cache = build_cache(n, weather_payload, forecast_payload, as_dicts)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return cache, size
+
+
+def time_lookups(cache, as_dicts, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in cache.values():
+            if as_dicts:
+                current, forecast = entry["weather"], entry["forecast"]
+                current["temperature"], current["description"], current["icon_url"]
+                for day in forecast:
+                    day["date"], day["temp_min"], day["temp_max"], day["icon_url"]
+            else:
+                current, forecast = entry
+                current.temperature, current.description, current.icon_url
+                for day in forecast:
+                    day.date, day.temp_min, day.temp_max, day.icon_url
+    return (time.perf_counter() - start) / (repeat * len(cache))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cities", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{args.cities} cached cities (current weather + 5 forecast days)")
+    for name, as_dicts in (("dicts", True), ("records", False)):
+        cache, size = measure(args.cities, as_dicts)
+        per_lookup = time_lookups(cache, as_dicts)
+        print(f"{name:<8} {size / 1024 / 1024:7.2f} MiB   {size / args.cities:7.0f} B/city   "
+              f"{per_lookup * 1e6:6.2f} us/city read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""WeatherService throughput against the local stub server.
+
+Sequential latency and concurrent throughput of get_weather_data and
+get_forecast_data, with and without network latency and injected errors.
+Runs offline, from the repository root:
+
+    python -m benchmarks.bench_service [--requests 200] [--json results.json]
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from api.weather_service import WeatherService
+from benchmarks import harness
+from benchmarks.stub_server import StubServer
+
+CITIES = ("London", "Paris", "Berlin", "Madrid", "Rome", "Vienna", "Prague", "Lisbon")
+
+
+def sequential(call, n):
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        call(CITIES[i % len(CITIES)])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def concurrent(call, n, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(call, (CITIES[i % len(CITIES)] for i in range(n))))
+    return n / (time.perf_counter() - start)
+
+
+def run(requests=200, workers=8, seed=0):
+    # Retry backoff jitter comes from the global generator
+    random.seed(seed)
+    results = {}
+    scenarios = (
+        ("local", 0.0, 0.0, 0.0),
+        ("20ms", 0.02, 0.005, 0.0),
+        ("20ms 5% errors", 0.02, 0.005, 0.05),
+    )
+    for label, latency, jitter, error_rate in scenarios:
+        with StubServer(latency=latency, jitter=jitter, seed=seed) as server:
+            service = server.configure(WeatherService())
+            # Each scenario sends fewer requests as latency grows, the rates stay comparable
+            n = requests if not latency else max(20, requests // 4)
+
+            for name, call in (("weather", service.get_weather_data), ("forecast", service.get_forecast_data)):
+                sequential(call, 5)
+                server.reset(seed)
+                if error_rate:
+                    server.add_fault("/data/", status=503, rate=error_rate)
+                results.update(harness.latency_metrics(f"{name} [{label}]", sequential(call, n)))
+                results[f"{name} [{label}] x{workers} throughput"] = harness.metric(
+                    concurrent(call, n * 2, workers), "req/s", better="higher"
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file, - for stdout")
+    args = parser.parse_args()
+
+    results = run(args.requests, args.workers, args.seed)
+    if args.json == "-":
+        print(json.dumps(results))
+        return
+    harness.report(results)
+    if args.json:
+        harness.save(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
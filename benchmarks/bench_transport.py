@@ -0,0 +1,58 @@
+"""Per-request latency of repeated city lookups, fresh connections vs the pooled session.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_transport [--requests 200]
+"""
+import argparse
+import statistics
+import time
+import requests
+from api import transport
+from api.weather_service import WeatherService
+from benchmarks.stub_server import StubServer
+
+
+def measure(service, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        service.get_weather_data("London")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1000
+    p95 = samples[int(len(samples) * 0.95) - 1] * 1000
+    print(f"{name:<22} p50 {p50:7.3f} ms   p95 {p95:7.3f} ms   mean {statistics.mean(samples) * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with StubServer() as server:
+        service = server.configure(WeatherService())
+
+        # Baseline: a new connection for every request, as with bare requests.get
+        original_get = transport.get
+        transport.get = lambda url, deadline=None, **kwargs: requests.get(url, timeout=deadline, **kwargs)
+        try:
+            measure(service, 5)
+            unpooled = measure(service, args.requests)
+        finally:
+            transport.get = original_get
+
+        measure(service, 5)
+        pooled = measure(service, args.requests)
+
+    report("requests.get", unpooled)
+    report("pooled session", pooled)
+    print(f"speedup (p50): {statistics.median(unpooled) / statistics.median(pooled):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Shared measurement, reporting and baseline comparison for the benchmarks.
+
+Results are flat mappings of metric name -> {"value", "unit", "better"} where
+`better` is "lower" or "higher". Saved as JSON they serve as the baseline a
+later run is compared against.
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_metrics(name, samples):
+    """p50/p95/mean metrics in milliseconds from samples in seconds."""
+    return {
+        f"{name} p50": metric(statistics.median(samples) * 1000, "ms"),
+        f"{name} p95": metric(percentile(samples, 0.95) * 1000, "ms"),
+        f"{name} mean": metric(statistics.mean(samples) * 1000, "ms"),
+    }
+
+
+def metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def report(results, file=None):
+    file = file or sys.stdout
+    for name, m in results.items():
+        print(f"  {name:<48} {m['value']:12.3f} {m['unit']}", file=file)
+
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(results, baseline, tolerance=0.15, file=None):
+    """Print each metric against `baseline`, return the names that regressed.
+
+    A metric regresses when it is worse than the baseline by more than
+    `tolerance`, as a fraction of the baseline value.
+    """
+    file = file or sys.stdout
+    regressions = []
+    for name, m in results.items():
+        base = baseline.get(name)
+        if base is None or not base["value"]:
+            print(f"  {name:<48} {m['value']:12.3f} {m['unit']}   (new)", file=file)
+            continue
+        change = (m["value"] - base["value"]) / base["value"]
+        worse = change > tolerance if m["better"] == "lower" else change < -tolerance
+        flag = "  REGRESSION" if worse else ""
+        print(f"  {name:<48} {m['value']:12.3f} {m['unit']}   {change:+7.1%} vs {base['value']:.3f}{flag}", file=file)
+        if worse:
+            regressions.append(name)
+    return regressions
@@ -0,0 +1,260 @@
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+ICON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "weather_icons")
+
+# Geolocation provider name (see utils.helpers.Location) -> (stub path, payload file)
+GEO_ROUTES = {
+    "ip-api": ("/geo/ip-api/json/", "geo_ip-api.json"),
+    "ipapi.co": ("/geo/ipapi.co/json/", "geo_ipapi.co.json"),
+    "ipwho.is": ("/geo/ipwho.is/", "geo_ipwho.is.json"),
+}
+
+
+def load_payload(name):
+    with open(os.path.join(PAYLOAD_DIR, name), "rb") as f:
+        return f.read()
+
+
+class Fault:
+    """An injected failure for requests whose path starts with `prefix`.
+
+    A matching request is delayed by `delay` seconds and then, if `status` is
+    set, answered with that status instead of its payload. `rate` is the
+    fraction of matching requests affected and `count` caps how many are.
+    """
+
+    def __init__(self, prefix="", status=503, rate=1.0, delay=0.0, retry_after=None, count=None):
+        self.prefix = prefix
+        self.status = status
+        self.rate = rate
+        self.delay = delay
+        self.retry_after = retry_after
+        self.remaining = count
+        self.applied = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between requests
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        delay, fault = server.plan(url.path)
+        if delay:
+            time.sleep(delay)
+
+        headers = {}
+        content_type = "application/json"
+        if fault is not None and fault.status:
+            self.send_response(fault.status)
+            body = json.dumps({"cod": fault.status, "message": "injected failure"}).encode()
+            if fault.retry_after is not None:
+                headers["Retry-After"] = str(fault.retry_after)
+        else:
+            body = server.payload(url.path, parse_qs(url.query))
+            if url.path.startswith("/img/wn/"):
+                content_type = "image/png"
+            if body is None:
+                self.send_response(404)
+                body = b'{"cod":"404","message":"city not found"}'
+                content_type = "application/json"
+            else:
+                self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Local stand-in for OpenWeatherMap and the geolocation providers.
+
+    Current weather and forecasts replay the recorded London payloads under
+    the name, ID or coordinates of the query, so every city resolves except
+    the ones in `unknown_cities`. Every response waits `latency` seconds plus
+    up to `jitter` more, drawn from a generator seeded with `seed` so runs are
+    repeatable. Failures are injected with add_fault().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0, jitter=0.0, seed=0):
+        super().__init__((host, port), StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.unknown_cities = {"nowhere"}
+        self.routes = {
+            "/data/2.5/weather": load_payload("weather.json"),
+            "/data/2.5/forecast": load_payload("forecast.json"),
+        }
+        for path, name in GEO_ROUTES.values():
+            self.routes[path] = load_payload(name)
+        self.hits = Counter()
+        self.faults = []
+        self._templates = {}
+        self._rendered = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_fault(self, prefix="", status=503, rate=1.0, delay=0.0, retry_after=None, count=None):
+        fault = Fault(prefix, status, rate, delay, retry_after, count)
+        with self._lock:
+            self.faults.append(fault)
+        return fault
+
+    def serve(self, path, body):
+        """Answer GET `path` with `body` as is, e.g. a generated city list."""
+        self.routes[path] = body
+
+    def clear_faults(self):
+        with self._lock:
+            self.faults.clear()
+
+    def reset(self, seed=0):
+        """Forget hits and faults and reseed, e.g. between benchmark rounds."""
+        with self._lock:
+            self.hits.clear()
+            self.faults.clear()
+            self._random.seed(seed)
+
+    def plan(self, path):
+        # Decide the delay and fault of one request under the lock, so the
+        # random sequence only depends on the order requests arrive in
+        with self._lock:
+            self.hits[path] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            for fault in self.faults:
+                if not path.startswith(fault.prefix) or fault.remaining == 0:
+                    continue
+                if fault.rate < 1.0 and self._random.random() >= fault.rate:
+                    continue
+                if fault.remaining is not None:
+                    fault.remaining -= 1
+                fault.applied += 1
+                return delay + fault.delay, fault
+        return delay, None
+
+    def payload(self, path, params):
+        if path == "/data/2.5/group":
+            return self.group_payload(params.get("id", [""])[0])
+        if path.startswith("/img/wn/"):
+            return self.icon(path.rsplit("/", 1)[-1])
+        if path in ("/data/2.5/weather", "/data/2.5/forecast"):
+            return self.city_payload(path, params)
+        return self.routes.get(path)
+
+    def city_payload(self, path, params):
+        if "q" in params:
+            name = params["q"][0].split(",")[0].strip()
+            if name.lower() in self.unknown_cities:
+                return None
+            key = ("q", name.lower())
+        elif "id" in params:
+            key = ("id", params["id"][0])
+        elif "lat" in params and "lon" in params:
+            key = ("coord", params["lat"][0], params["lon"][0])
+        else:
+            return None
+
+        cached = self._rendered.get((path, key))
+        if cached is not None:
+            return cached
+
+        template = self._templates.get(path)
+        if template is None:
+            template = self._templates[path] = json.loads(self.routes[path])
+        data = json.loads(json.dumps(template))
+        if path == "/data/2.5/weather":
+            target = data
+        else:
+            target = data["city"]
+        if key[0] == "q":
+            target["name"] = name.title()
+            target["id"] = zlib.crc32(name.lower().encode()) % 10_000_000
+        elif key[0] == "id":
+            target["id"] = int(key[1])
+            target["name"] = f"City {key[1]}"
+        else:
+            target["coord"] = {"lat": float(key[1]), "lon": float(key[2])}
+        body = json.dumps(data).encode()
+        self._rendered[(path, key)] = body
+        return body
+
+    def icon(self, name):
+        # Any icon code is answered with a bundled image, so downloads always succeed
+        path = os.path.join(ICON_DIR, name)
+        if not os.path.exists(path):
+            path = os.path.join(ICON_DIR, "01d.png")
+        with open(path, "rb") as f:
+            return f.read()
+
+    def group_payload(self, ids):
+        template = json.loads(self.routes["/data/2.5/weather"])
+        items = []
+        for city_id in filter(None, ids.split(",")):
+            items.append(dict(template, id=int(city_id), name=f"City {city_id}"))
+        return json.dumps({"cnt": len(items), "list": items}).encode()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def configure(self, service):
+        """Point a WeatherService instance at this server.
+
+        The stub has no quota, so the service gets its own scheduler that
+        never throttles instead of the shared one sized to the real API key.
+        Names are sent as typed even when a city index has been built, so
+        results do not depend on the machine.
+        """
+        from api.scheduler import QuotaScheduler
+
+        service.base_url = f"{self.url}/data/2.5/weather"
+        service.base_url_forecast = f"{self.url}/data/2.5/forecast"
+        service.base_url_group = f"{self.url}/data/2.5/group"
+        service.icon_base_url = f"{self.url}/img/wn"
+        service.scheduler = QuotaScheduler(per_minute=10 ** 9, burst=10 ** 6)
+        service.city_index = None
+        return service
+
+    def location_providers(self):
+        """A Location.PROVIDERS mapping whose providers all point at this server."""
+        from utils.helpers import Location
+
+        providers = {}
+        for name, (path, _) in GEO_ROUTES.items():
+            providers[name] = dict(Location.PROVIDERS[name], url=f"{self.url}{path}")
+        return providers
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,102 @@
+"""Headless mode: fetch cities and stream one JSON line per city, without Qt.
+
+    python main.py --headless London Paris 2643743
+    python main.py --headless --forecast < cities.txt
+
+Cities come from the arguments, or one per line from stdin when there are
+none (or the only one is "-"), blank lines and lines starting with # are
+skipped. Results are written in completion order as they arrive, so the
+order differs from the input: each line carries the query it answers as
+"city". Numeric city IDs are looked up by ID. Exits with status 1 if any
+city failed. Stdout carries nothing but the JSON lines, whatever the app
+prints meanwhile (retries, fallbacks, a missing city index) goes to stderr.
+
+Nothing in here may import PyQt6, directly or through gui/.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from api import scheduler
+from api.models import to_dict
+from api.weather_service import WeatherService
+
+
+def read_cities(lines):
+    for line in lines:
+        city = line.strip()
+        if city and not city.startswith("#"):
+            yield city
+
+
+def record(city, current, forecast=None, error=None):
+    if error is not None:
+        return {"city": str(city), "error": error}
+    line = {"city": str(city), "current": to_dict(current)}
+    if forecast is not None:
+        line["forecast"] = [to_dict(day) for day in forecast]
+    return line
+
+
+def stream(cities, out, service=None, forecast=False, workers=None):
+    """Fetch `cities` and write one JSON line per city to `out`, return the failure count."""
+    if service is None:
+        service = WeatherService()
+        # Headless lookups are batch work, the app can go ahead of them
+        service.priority = scheduler.BATCH
+
+    if forecast:
+        results = (
+            (city, *(bundle or (None, None)), error)
+            for city, bundle, error in service.get_bundle_many(cities, max_workers=workers)
+        )
+    else:
+        results = (
+            (city, current, None, error)
+            for city, current, error in service.get_weather_many(cities, max_workers=workers)
+        )
+
+    failed = 0
+    for city, current, days, error in results:
+        failed += error is not None
+        out.write(json.dumps(record(city, current, days, error), ensure_ascii=False) + "\n")
+        out.flush()
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py --headless", description="Stream weather as JSON lines.")
+    parser.add_argument("cities", nargs="*", help="city names or IDs, read from stdin if omitted")
+    parser.add_argument("--forecast", action="store_true", help="include the daily forecast")
+    parser.add_argument("--workers", type=int, help="max requests in flight")
+    parser.add_argument(
+        "--units", choices=("metric", "imperial", "standard"), default="metric",
+        help="wind speed is in km/h, mph and m/s respectively",
+    )
+    parser.add_argument("--lang", default="en")
+    args = parser.parse_args(argv)
+
+    if not args.cities or args.cities == ["-"]:
+        cities = read_cities(sys.stdin)
+    else:
+        cities = args.cities
+
+    out = sys.stdout
+    try:
+        # Diagnostics are print()ed, keep them out of the JSON stream
+        with contextlib.redirect_stdout(sys.stderr):
+            service = WeatherService()
+            service.priority = scheduler.BATCH
+            service.units = args.units
+            service.lang = args.lang
+            failed = stream(cities, out, service, args.forecast, args.workers)
+    except BrokenPipeError:
+        # The reader went away, e.g. `| head`: keep the final flush at exit from raising again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
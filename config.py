@@ -3,5 +3,108 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _location_providers(spec):
+    # "name" or "name:seconds" entries -> names in order, {name: timeout} of those with one
+    names, timeouts = [], {}
+    for entry in spec.split(","):
+        name, _, timeout = (part.strip() for part in entry.partition(":"))
+        if name:
+            names.append(name)
+            if timeout:
+                timeouts[name] = float(timeout)
+    return names, timeouts
+
+
 class Config:
-    OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
\ No newline at end of file
+    OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+
+    # Persistent cache
+    CACHE_DIR = os.getenv("WEATHER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".weatherapp"))
+    CACHE_DB = os.path.join(CACHE_DIR, "weather_cache.sqlite3")
+    CACHE_WEATHER_TTL = int(os.getenv("WEATHER_CACHE_WEATHER_TTL", 60 * 10))  # 10 minutes
+    CACHE_FORECAST_TTL = int(os.getenv("WEATHER_CACHE_FORECAST_TTL", 60 * 60))  # 1 hour
+    CACHE_MAX_CITIES = int(os.getenv("WEATHER_CACHE_MAX_CITIES", 200))
+
+    # HTTP transport
+    HTTP_POOL_SIZE = int(os.getenv("WEATHER_HTTP_POOL_SIZE", 10))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("WEATHER_HTTP_CONNECT_TIMEOUT", 3))
+    HTTP_READ_TIMEOUT = float(os.getenv("WEATHER_HTTP_READ_TIMEOUT", 5))
+    # Upper bound for one call including every retry, this bounds the p99
+    HTTP_DEADLINE = float(os.getenv("WEATHER_HTTP_DEADLINE", 10))
+    HTTP_RETRIES = int(os.getenv("WEATHER_HTTP_RETRIES", 2))
+    HTTP_BACKOFF = float(os.getenv("WEATHER_HTTP_BACKOFF", 0.25))  # seconds, doubled per retry
+    HTTP_BACKOFF_MAX = float(os.getenv("WEATHER_HTTP_BACKOFF_MAX", 2))
+    # Send a second copy of a request still unanswered after this many seconds, 0 disables hedging
+    HTTP_HEDGE_AFTER = float(os.getenv("WEATHER_HTTP_HEDGE_AFTER", 0))
+    # Consecutive failures that open a host's circuit, and how long it stays open
+    HTTP_BREAKER_THRESHOLD = int(os.getenv("WEATHER_HTTP_BREAKER_THRESHOLD", 5))
+    HTTP_BREAKER_RESET = float(os.getenv("WEATHER_HTTP_BREAKER_RESET", 30))
+
+    # API quota of the OpenWeatherMap key, every call is scheduled against it
+    API_CALLS_PER_MINUTE = int(os.getenv("WEATHER_API_CALLS_PER_MINUTE", 60))
+    API_BURST = int(os.getenv("WEATHER_API_BURST", 10))
+    # Tokens background and batch calls leave for interactive lookups
+    API_INTERACTIVE_RESERVE = int(os.getenv("WEATHER_API_INTERACTIVE_RESERVE", 2))
+    # Wait after a 429 without a Retry-After header, in seconds
+    API_RETRY_AFTER = float(os.getenv("WEATHER_API_RETRY_AFTER", 10))
+
+    # Fetch current weather and forecast in parallel instead of one after the other
+    FETCH_CONCURRENT = os.getenv("WEATHER_FETCH_CONCURRENT", "1") not in ("0", "false", "False")
+
+    # Single request mode: derive current conditions from the forecast payload
+    SINGLE_REQUEST = os.getenv("WEATHER_SINGLE_REQUEST", "0") in ("1", "true", "True")
+    # Optional endpoint returning {"current": <weather payload>, "forecast": <forecast payload>}
+    COMBINED_URL = os.getenv("WEATHER_COMBINED_URL")
+    # Max distance in seconds between now and the first forecast slot to use it as current data
+    SINGLE_REQUEST_MAX_SKEW = int(os.getenv("WEATHER_SINGLE_REQUEST_MAX_SKEW", 60 * 90))
+
+    # Max requests in flight for multi-city lookups
+    BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", 8))
+
+    # Show cached data right away, even if expired, and refresh it in the background
+    STALE_WHILE_REVALIDATE = os.getenv("WEATHER_STALE_WHILE_REVALIDATE", "1") not in ("0", "false", "False")
+
+    # Where weather icons are downloaded from
+    ICON_BASE_URL = os.getenv("WEATHER_ICON_BASE_URL", "http://openweathermap.org/img/wn")
+    # Downloaded weather icons, stored by content hash
+    ICON_CACHE_DIR = os.path.join(CACHE_DIR, "icons")
+    ICON_FETCH_WORKERS = int(os.getenv("WEATHER_ICON_FETCH_WORKERS", 6))
+    # Memory budget for pre-scaled icon pixmaps
+    ICON_CACHE_BYTES = int(os.getenv("WEATHER_ICON_CACHE_BYTES", 8 * 1024 * 1024))
+
+    # Print how long each theme switch takes
+    THEME_TIMING = os.getenv("WEATHER_THEME_TIMING", "0") in ("1", "true", "True")
+
+    # Scale fonts smoothly between layout breakpoints instead of in steps
+    RESPONSIVE_FLUID = os.getenv("WEATHER_RESPONSIVE_FLUID", "0") in ("1", "true", "True")
+
+    # IP geolocation: providers tried in order, result kept until the TTL expires or the network changes.
+    # An entry may carry its own timeout in seconds, e.g. "ip-api:1.5,ipapi.co,ipify:4"; the others use LOCATION_TIMEOUT
+    LOCATION_PROVIDERS, LOCATION_TIMEOUTS = _location_providers(
+        os.getenv("WEATHER_LOCATION_PROVIDERS", "ip-api,ipapi.co,ipwho.is,ipify")
+    )
+    LOCATION_TIMEOUT = float(os.getenv("WEATHER_LOCATION_TIMEOUT", 3))
+    LOCATION_TTL = int(os.getenv("WEATHER_LOCATION_TTL", 60 * 60 * 24))  # 1 day
+    LOCATION_FILE = os.path.join(CACHE_DIR, "location.json")
+
+    # Local city index for suggestions and ID lookups, see api/city_index.py
+    CITY_INDEX_FILE = os.getenv("WEATHER_CITY_INDEX", os.path.join(CACHE_DIR, "cities.idx"))
+    CITY_LIST_URL = os.getenv("WEATHER_CITY_LIST_URL", "https://bulk.openweathermap.org/sample/city.list.json.gz")
+
+    # Background refresh of pinned cities
+    PINNED_REFRESH = os.getenv("WEATHER_PINNED_REFRESH", "1") not in ("0", "false", "False")
+    # How often the provider publishes new data, refreshing sooner gets the same payload back
+    PROVIDER_WEATHER_CADENCE = int(os.getenv("WEATHER_PROVIDER_WEATHER_CADENCE", 60 * 10))
+    PROVIDER_FORECAST_CADENCE = int(os.getenv("WEATHER_PROVIDER_FORECAST_CADENCE", 60 * 60 * 3))
+    # Refresh this long before an entry expires, minus a random jitter of up to REFRESH_JITTER
+    REFRESH_LEAD = int(os.getenv("WEATHER_REFRESH_LEAD", 60))
+    REFRESH_JITTER = int(os.getenv("WEATHER_REFRESH_JITTER", 45))
+    # First retry delay after a failed refresh, doubled on every further failure
+    REFRESH_RETRY = int(os.getenv("WEATHER_REFRESH_RETRY", 60 * 2))
+    REFRESH_CONCURRENCY = int(os.getenv("WEATHER_REFRESH_CONCURRENCY", 2))
+
+    # Performance telemetry, also enabled by --telemetry. F12 toggles the overlay
+    TELEMETRY = os.getenv("WEATHER_TELEMETRY", "0") in ("1", "true", "True")
+    # File the measurements are written to on exit, Prometheus text for .prom/.txt, JSON otherwise
+    TELEMETRY_DUMP = os.getenv("WEATHER_TELEMETRY_DUMP")
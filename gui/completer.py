@@ -0,0 +1,60 @@
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QStandardItem, QStandardItemModel
+from PyQt6.QtWidgets import QCompleter
+from api.city_index import get_index
+from utils.telemetry import TELEMETRY
+
+
+class CityCompleter(QCompleter):
+    """Suggestions from the local city index under a line edit.
+
+    The index is searched on every edit and the popup shows its results as
+    they are, Qt does no filtering of its own. Picking a suggestion, with
+    the mouse or Enter, emits city_chosen with the City so the lookup can go
+    by ID. Does nothing while no index has been built.
+    """
+
+    city_chosen = pyqtSignal(object)  # City
+
+    def __init__(self, line_edit, limit=8, index=None):
+        super().__init__(line_edit)
+        self.index = index if index is not None else get_index()
+        self.limit = limit
+        self._cities = {}  # label -> City of the current suggestions
+
+        self.setModel(QStandardItemModel(self))
+        self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.setMaxVisibleItems(limit)
+        self.setWidget(line_edit)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_suggestions)
+        self.activated.connect(self.on_activated)
+
+    def update_suggestions(self, text):
+        if self.index is None:
+            return
+
+        with TELEMETRY.timer("city_search"):
+            cities = self.index.search(text, self.limit) if text.strip() else []
+
+        model = self.model()
+        model.clear()
+        self._cities = {}
+        for city in cities:
+            self._cities.setdefault(city.label, city)
+            model.appendRow(QStandardItem(city.label))
+
+        if cities:
+            self.complete()
+        else:
+            self.popup().hide()
+
+    def is_selecting(self):
+        """True while a suggestion is highlighted, Enter will pick it."""
+        return self.popup().isVisible() and self.popup().currentIndex().isValid()
+
+    def on_activated(self, text):
+        city = self._cities.get(text)
+        if city is not None:
+            self.city_chosen.emit(city)
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt6.QtCore import QThread, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QPixmapCache
+from api import transport
+from config import Config
+from utils.helpers import resource_path
+from utils.telemetry import TELEMETRY
+
+
+def icon_code(icon_url):
+    # "http://openweathermap.org/img/wn/01d@2x.png" -> "01d@2x"
+    return icon_url.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+
+class IconAtlas:
+    """Decoded icons kept in memory, keyed by icon code.
+
+    Holds QImage rather than QPixmap so worker threads can add to it safely.
+    """
+
+    def __init__(self):
+        self._images = {}
+        self._lock = threading.Lock()
+        self._preload_lock = threading.Lock()
+        self._preloaded = False
+
+    def get(self, code):
+        with self._lock:
+            return self._images.get(code)
+
+    def add(self, code, image):
+        with self._lock:
+            self._images[code] = image
+
+    def ensure_preloaded(self):
+        # The first IconLoader pays for decoding the bundled icons, off the GUI
+        # thread, one started meanwhile waits for it rather than downloading them
+        if not self._preloaded:
+            self.preload()
+
+    def __len__(self):
+        return len(self._images)
+
+    def preload(self, directory=None):
+        """Decode every bundled icon once, at startup."""
+        directory = directory or resource_path(os.path.join("assets", "weather_icons"))
+        with self._preload_lock:
+            if self._preloaded:
+                return
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    code, ext = os.path.splitext(name)
+                    if ext.lower() != ".png" or self.get(code) is not None:
+                        continue
+                    image = QImage(os.path.join(directory, name))
+                    if not image.isNull():
+                        self.add(code, image)
+            # Only once every icon is in, a loader seeing this finds them all
+            self._preloaded = True
+
+
+class IconDiskCache:
+    """Downloaded icons stored under the SHA-256 of their content.
+
+    `index.json` maps icon codes to content hashes, so identical images
+    served under different codes are stored once.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or Config.ICON_CACHE_DIR
+        self._index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self._index_path, "r") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.png")
+
+    def load(self, code):
+        with self._lock:
+            digest = self._index.get(code)
+        if digest is None or not os.path.exists(self._path(digest)):
+            return None
+        image = QImage(self._path(digest))
+        return None if image.isNull() else image
+
+    def store(self, code, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._index[code] = digest
+            tmp_path = f"{self._index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path)
+
+
+class ScaledIconCache:
+    """Pixmaps already scaled for the label they are shown in.
+
+    Keyed by (condition code, logical size, device pixel ratio). Pixmaps live
+    in QPixmapCache; this class tracks their order of use and evicts the least
+    recently used ones once `budget` bytes are exceeded. GUI thread only.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or Config.ICON_CACHE_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> size in bytes
+        # Make sure Qt's own limit never evicts before we do
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), self.budget // 1024 * 2))
+
+    @staticmethod
+    def key(code, size, dpr):
+        # "01d@2x" and "01d" are the same condition, only the source resolution differs
+        return f"weather-icon:{code.split('@')[0]}:{size}:{dpr:g}"
+
+    def pixmap(self, code, image, size, dpr):
+        key = self.key(code, size, dpr)
+        if key in self._entries:
+            pixmap = QPixmapCache.find(key)
+            if pixmap is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return pixmap
+            self._forget(key)
+
+        self.misses += 1
+        pixels = round(size * dpr)
+        pixmap = QPixmap.fromImage(image.scaled(
+            pixels, pixels,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        ))
+        pixmap.setDevicePixelRatio(dpr)
+
+        cost = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        QPixmapCache.insert(key, pixmap)
+        self._entries[key] = cost
+        self.bytes += cost
+        while self.bytes > self.budget and len(self._entries) > 1:
+            self._forget(next(iter(self._entries)))
+        return pixmap
+
+    def _forget(self, key):
+        self.bytes -= self._entries.pop(key)
+        QPixmapCache.remove(key)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self.bytes}
+
+    def clear(self):
+        for key in list(self._entries):
+            self._forget(key)
+
+
+ICON_ATLAS = IconAtlas()
+_disk_cache = None
+
+
+def get_disk_cache():
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = IconDiskCache()
+    return _disk_cache
+
+
+class IconLoader(QThread):
+    """Resolve icon URLs to QImages: atlas, then disk cache, then parallel downloads."""
+
+    icon_loaded = pyqtSignal(str, QImage)
+
+    def __init__(self, icon_urls, atlas=None, disk_cache=None):
+        super().__init__()
+        self.icon_urls = icon_urls
+        self.atlas = atlas or ICON_ATLAS
+        self.disk_cache = disk_cache
+
+    def run(self):
+        self.atlas.ensure_preloaded()
+        disk_cache = self.disk_cache or get_disk_cache()
+        missing = {}
+        for url in dict.fromkeys(self.icon_urls):
+            start = time.perf_counter()
+            code = icon_code(url)
+            image = self.atlas.get(code)
+            source = "memory"
+            if image is None:
+                image = disk_cache.load(code)
+                source = "disk"
+                if image is not None:
+                    self.atlas.add(code, image)
+            if image is not None:
+                TELEMETRY.observe("icon_load", time.perf_counter() - start, source=source)
+                self.icon_loaded.emit(url, image)
+            else:
+                missing[url] = code
+
+        if not missing:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(len(missing), Config.ICON_FETCH_WORKERS)) as executor:
+            futures = {executor.submit(self.fetch, url, code, disk_cache): url for url, code in missing.items()}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    image = future.result()
+                except Exception as e:
+                    print(f"Error loading icon from {url}: {str(e)}")
+                    continue
+                if image is not None:
+                    self.icon_loaded.emit(url, image)
+
+    def fetch(self, url, code, disk_cache):
+        # Download, decode and store one icon, runs in a pool thread
+        start = time.perf_counter()
+        icon_response = transport.get(url)
+        if icon_response.status_code != 200:
+            return None
+        image = QImage.fromData(icon_response.content)
+        if image.isNull():
+            return None
+        self.atlas.add(code, image)
+        disk_cache.store(code, icon_response.content)
+        TELEMETRY.observe("icon_load", time.perf_counter() - start, source="network")
+        return image
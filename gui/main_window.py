@@ -3,103 +3,27 @@ from PyQt6.QtWidgets import (
     QApplication, QHBoxLayout, QGridLayout, QMessageBox, QSizePolicy,
     QDialog, QGraphicsDropShadowEffect
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QPropertyAnimation
-from PyQt6.QtGui import QIcon, QPixmap, QColor
-import os
-import sys
+from PyQt6.QtCore import Qt, QEvent, QTimer, QPropertyAnimation
+from PyQt6.QtGui import QIcon, QPixmap, QColor, QKeySequence, QShortcut
 import time
-from utils.helpers import Location
-from api.weather_service import WeatherService
-import requests
-from functools import lru_cache
+from utils.helpers import resource_path
+from api.cache import WeatherCache
+from config import Config
+from gui.completer import CityCompleter
+from gui.icons import ICON_ATLAS, IconLoader, ScaledIconCache, icon_code
+from gui.overlay import TelemetryOverlay
+from gui.refresher import PinnedRefresher
+from gui.request_manager import WeatherRequestManager
+from gui.responsive import ResponsiveLayout
+from gui.theme import ThemeEngine
+from utils.profiler import STARTUP
+from utils.telemetry import TELEMETRY
+from gui.workers import LocationWorker
+
+WEATHER_ICON_SIZE = 100
+FORECAST_ICON_SIZE = 50
 
 
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
-
-ICON_CACHE = {}
-
-class LocationWorker(QThread):
-    location_result = pyqtSignal(str)
-    location_error = pyqtSignal(str)
-
-    def run(self):
-        try:
-            city = Location.get_location()
-            if city:
-                self.location_result.emit(city)
-            else:
-                self.location_error.emit("Could not retrieve location coordinates.")
-        except Exception as e:
-            self.location_error.emit(f"Location error: {str(e)}")
-
-class WeatherWorker(QThread):
-    weather_result = pyqtSignal(dict)
-    forecast_result = pyqtSignal(list)
-    error = pyqtSignal(str)
-
-    def __init__(self, city):
-        super().__init__()
-        self.city = city
-        self.weather_service = WeatherService()
-
-    def run(self):
-        try:
-            weather_data = self.weather_service.get_weather_data(self.city)
-            if weather_data:
-                self.weather_result.emit(weather_data)
-                
-                forecast_data = self.weather_service.get_forecast_data(self.city)
-                if forecast_data:
-                    self.forecast_result.emit(forecast_data)
-            else:
-                self.error.emit(f"Could not find weather data for {self.city}.")
-        except Exception as e:
-            self.error.emit(f"Error: {str(e)}")
-
-def get_icon_path(icon_url):
-    if "http" in icon_url:
-        icon_url = icon_url.split("/")[-1].split(".")[0]
-    return os.path.join("assets", "weather_icons", f"{icon_url}.png")
-
-class IconLoader(QThread):
-    icon_loaded = pyqtSignal(str, QPixmap)
-
-    def __init__(self, icon_urls):
-        super().__init__()
-        self.icon_urls = icon_urls
-        os.makedirs(os.path.join("assets", "weather_icons"), exist_ok=True)
-
-    def run(self):
-        for url in self.icon_urls:
-            if url in ICON_CACHE:
-                self.icon_loaded.emit(url, ICON_CACHE[url])
-            else:
-                icon_url = url.split("/")[-1].split(".")[0]
-                local_path = get_icon_path(icon_url)
-
-                if os.path.exists(local_path):
-                    icon_pixmap = QPixmap(local_path)
-                    ICON_CACHE[url] = icon_pixmap
-                    self.icon_loaded.emit(url, icon_pixmap)
-                else:
-                    try:
-                        icon_response = requests.get(url)
-                        if icon_response.status_code == 200:
-                            icon_data = icon_response.content
-                            icon_pixmap = QPixmap()
-                            icon_pixmap.loadFromData(icon_data)
-                            ICON_CACHE[url] = icon_pixmap
-                            icon_pixmap.save(local_path, "PNG")
-                            self.icon_loaded.emit(url, icon_pixmap)
-                    except Exception as e:
-                        print(f"Error loading icon from {url}: {str(e)}")
-
 class CustomErrorDialog(QDialog):
     def __init__(self, message, parent=None):
         super().__init__(parent)
@@ -242,10 +166,14 @@ class WeatherGUI(QWidget):
         super().__init__()
         self.is_dark_mode = False
         self.current_weather_condition = None
+        self.theme = None
         self.dark_mode_button = QPushButton()
         self.dark_mode_button.setCheckable(True)
         icon_path = resource_path("assets/dark_mode.png")
         self.dark_mode_button.setIcon(QIcon(icon_path))
+        self.pin_button = QPushButton("☆")
+        self.pin_button.setCheckable(True)
+        self.pin_button.setEnabled(False)
         self.weather_city_label = QLabel()
         self.weather_country_label = QLabel()
         self.weather_temp_label = QLabel()
@@ -258,39 +186,69 @@ class WeatherGUI(QWidget):
         self.weather_label = QLabel("Weather Information")
         self.forecast_label = QLabel("Forecast Information")
         self.status_label = QLabel("Loading...")
+        self.age_label = QLabel()
 
         self.weather_panel = QWidget()
         self.weather_panel.setObjectName("weather_panel")
 
-        self.forecast_icons = {}
+        self.forecast_columns = []
+        self.current_city = None
+        self.current_icon_url = None
         self.is_loading = False
+        self.is_revalidating = False
+        self.data_updated_at = None
+        self.switch_started = None  # perf_counter() of the city switch waiting for data
+        self.paint_pending_since = None
 
         self.weather_grid = QGridLayout()
         self.forecast_grid = QGridLayout()
         self.forecast_grid.setObjectName("forecast_grid")
         self.top_layout = QHBoxLayout()
 
+        self.responsive = ResponsiveLayout(fluid=Config.RESPONSIVE_FLUID)
+        self.responsive.bind("city", self.weather_city_label)
+        self.responsive.bind("country", self.weather_country_label)
+        self.responsive.bind("temp", self.weather_temp_label)
+        self.responsive.bind("description", self.weather_description_label)
+        self.responsive.bind("title", self.weather_label, self.forecast_label)
+        self.responsive.bind("title_margins", self.weather_label, self.forecast_label)
+
         self.initializeGUI()
         self.create_layout()
         self.setup_connections()
 
         self.location_worker = None
-        self.weather_worker = None
+        self.location_generation = 0
         self.icon_loader = None
+        self.icon_loaders = set()
+
+        self.weather_cache = WeatherCache()
+        self.weather_requests = WeatherRequestManager(self.weather_cache, self)
+        self.weather_requests.weather_ready.connect(self.on_weather_received)
+        self.weather_requests.forecast_ready.connect(self.on_forecast_received)
+        self.weather_requests.error.connect(self.on_weather_error)
+        self.weather_requests.finished.connect(self.on_worker_finished)
+        self.scaled_icons = ScaledIconCache()
+
+        self.refresher = PinnedRefresher(self.weather_cache, self)
+        self.refresher.refreshed.connect(self.on_pinned_refreshed)
 
-        self.weather_cache = {}
-        self.last_update = {}
-        self.cache_fresh_time = 60 * 10 # 10 minutes
+        self.age_timer = QTimer(self)
+        self.age_timer.timeout.connect(self.update_age_label)
+        self.age_timer.start(30 * 1000)
 
         self.load_stylesheet()
+        self.show_cached_snapshot()
+
+        if Config.PINNED_REFRESH:
+            self.refresher.start()
 
         QTimer.singleShot(100, self.show_ip_weather) # A little delay to allow the GUI to load before fetching the weather data
 
     def load_stylesheet(self):
         try:
-            with open("styles.css", "r") as f:
-                stylesheet = f.read()
-            self.setStyleSheet(stylesheet)
+            self.theme = ThemeEngine.load(resource_path("styles.css"))
+            self.apply_theme()
         except Exception as e:
             print(f"Error al cargar el archivo CSS: {str(e)}")
 
@@ -312,24 +270,37 @@ class WeatherGUI(QWidget):
         self.weather_city_label.setObjectName("city_name")
         self.weather_country_label.setObjectName("country_name")
         self.weather_temp_label.setObjectName("weather_temp_label")
-        self.weather_description_label.setObjectName("weather_value")
+        self.weather_description_label.setObjectName("weather_description")
         self.weather_humidity_label.setObjectName("weather_value")
         self.weather_wind_speed_label.setObjectName("weather_value")
+
+        # Labels coloured by the current weather condition, see gui.theme
+        for widget in [self.weather_temp_label, self.weather_description_label,
+                       self.weather_humidity_label, self.weather_wind_speed_label]:
+            widget.setProperty("weatherStyled", "true")
         self.weather_icon.setObjectName("weather_icon")
         self.weather_label.setObjectName("weather_title")
         self.forecast_label.setObjectName("forecast_title")
         self.status_label.setObjectName("status_label")
+        self.age_label.setObjectName("age_label")
+        self.pin_button.setObjectName("pin_button")
+        self.pin_button.setToolTip("Pin this city to keep its weather up to date")
 
         self.weather_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.forecast_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
         self.city_input.setPlaceholderText("Enter city name")
+        self.city_completer = CityCompleter(self.city_input)
 
     def setup_connections(self):
         self.city_button.clicked.connect(self.get_weather)
         self.city_input.returnPressed.connect(self.get_weather)
+        self.city_completer.city_chosen.connect(self.on_city_chosen)
         self.dark_mode_button.clicked.connect(self.toggle_dark_mode)
+        self.pin_button.clicked.connect(self.toggle_pinned)
+        self.telemetry_overlay = TelemetryOverlay(self)
+        QShortcut(QKeySequence("F12"), self, self.telemetry_overlay.toggle)
 
     def create_layout(self):
         main_layout = QVBoxLayout()
@@ -338,6 +309,7 @@ class WeatherGUI(QWidget):
         self.top_layout.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignTop)
         self.top_layout.addWidget(self.weather_city_label)
         self.top_layout.addWidget(self.weather_country_label)
+        self.top_layout.addWidget(self.pin_button)
         self.top_layout.addStretch(1)
         self.top_layout.addWidget(self.dark_mode_button)
         self.top_layout.addWidget(self.city_input)
@@ -347,6 +319,8 @@ class WeatherGUI(QWidget):
         status_layout = QHBoxLayout()
         status_layout.addWidget(self.status_label)
         self.status_label.hide()
+        status_layout.addWidget(self.age_label, 0, Qt.AlignmentFlag.AlignRight)
+        self.age_label.hide()
 
         #Create middle layout (weather information)
         mid_layout = QVBoxLayout(self.weather_panel)
@@ -387,202 +361,310 @@ class WeatherGUI(QWidget):
 
     def update_weather_display(self, current_weather):
         #Update the weather information labels
-        if current_weather:
-            self.weather_city_label.setText(f"{current_weather['city_name']},")
-            self.weather_country_label.setText(current_weather["country"])
-            self.weather_temp_label.setText(f"{current_weather['temperature']}°C")
-            self.weather_description_label.setText(current_weather["description"])
-            self.weather_humidity_label.setText(f"Humidity: {current_weather['humidity']}%")
-            self.weather_wind_speed_label.setText(f"Wind Speed: {current_weather['wind_speed']} km/h")
+        if not current_weather:
+            return
+
+        start = time.perf_counter()
+        self.weather_city_label.setText(f"{current_weather.city_name},")
+        self.weather_country_label.setText(current_weather.country)
+        self.weather_temp_label.setText(f"{current_weather.temperature}°C")
+        self.weather_description_label.setText(current_weather.description)
+        self.weather_humidity_label.setText(f"Humidity: {current_weather.humidity}%")
+        self.weather_wind_speed_label.setText(f"Wind Speed: {current_weather.wind_speed} km/h")
 
         #icon will load in Icon_loader thread to improve performance
-        if "icon_url" in current_weather:
-            self.collect_and_load_icons([current_weather["icon_url"]])
+        if current_weather.icon_url:
+            self.current_icon_url = current_weather.icon_url
+            self.collect_and_load_icons([current_weather.icon_url])
+
+        if current_weather.description:
+            self.apply_weather_style(current_weather.description)
+        self.record_widget_update("weather", start)
+
+    def record_widget_update(self, widget, start):
+        if not TELEMETRY.enabled:
+            return
+        TELEMETRY.observe("widget_update", time.perf_counter() - start, widget=widget)
+        if self.paint_pending_since is None:
+            self.paint_pending_since = start
+
+    def show_cached_snapshot(self):
+        # Draw the last viewed city from the persistent cache, even if it is stale,
+        # while the fresh data is fetched in the background
+        city = self.weather_cache.last_city()
+        if not city:
+            return
+
+        weather_data, weather_age = self.weather_cache.get_entry(city, "weather")
+        forecast_data, _ = self.weather_cache.get_entry(city, "forecast")
+        if weather_data:
+            self.set_current_city(city)
+            self.show_cached_weather(weather_data, forecast_data, weather_age)
+            STARTUP.mark("snapshot_drawn")
+
+    def set_current_city(self, city):
+        self.current_city = city
+        self.pin_button.setEnabled(True)
+        pinned = self.weather_cache.is_pinned(city)
+        self.pin_button.setChecked(pinned)
+        self.pin_button.setText("★" if pinned else "☆")
+
+    def toggle_pinned(self):
+        if not self.current_city:
+            return
+        if self.pin_button.isChecked():
+            self.refresher.pin(self.current_city)
+        else:
+            self.refresher.unpin(self.current_city)
+        self.set_current_city(self.current_city)
+
+    def on_pinned_refreshed(self, city):
+        # Only redraw when the refreshed city is on screen and nothing newer is loading
+        if (self.current_city is None or self.is_loading
+                or city != self.weather_cache.key(self.current_city)):
+            return
+        weather_data, weather_age = self.weather_cache.get_entry(city, "weather")
+        forecast_data, _ = self.weather_cache.get_entry(city, "forecast")
+        if weather_data:
+            self.show_cached_weather(weather_data, forecast_data, weather_age)
 
-        if "description" in current_weather:
-            self.apply_weather_style(current_weather["description"])
+    def show_cached_weather(self, weather_data, forecast_data, age):
+        self.update_weather_display(weather_data)
+        if forecast_data:
+            self.update_forecast_display(forecast_data)
+            icon_urls = [item.icon_url for item in forecast_data if item.icon_url]
+            if icon_urls:
+                self.collect_and_load_icons(icon_urls)
+
+        self.data_updated_at = time.time() - age
+        self.update_age_label()
 
     def show_ip_weather(self):
+        # Remember which lookup was current, a search typed meanwhile wins over the IP location
+        self.location_generation = self.weather_requests.generation
         self.location_worker = LocationWorker()
         self.location_worker.location_result.connect(self.on_location_detected)
         self.location_worker.location_error.connect(self.on_location_error)
         self.location_worker.start()
 
-    def on_location_detected(self, city):
-        self.get_weather_for_city(city)
+    def on_location_detected(self, location):
+        if self.weather_requests.generation != self.location_generation:
+            return
+        # Coordinates pin the lookup to the detected place, the city name keys the cache
+        self.get_weather_for_city(location.city, query=location.coords)
 
     def on_location_error(self, error_message):
         self.show_error_message(error_message)
         self.hide_loading()
 
-    def get_weather_for_city(self, city):
+    def get_weather_for_city(self, city, query=None):
+        self.switch_started = time.perf_counter()
         self.city_input.clear()
-        if city in self.weather_cache and time.time() - self.last_update.get(city, 0) < self.cache_fresh_time:
-            weather_data = self.weather_cache[city].get("weather")
-            forecast_data = self.weather_cache[city].get("forecast")
-
-            if weather_data:
-                self.update_weather_display(weather_data)
-
-            if forecast_data:
-                self.update_forecast_display(forecast_data)
-                icon_urls = [item["icon_url"] for item in forecast_data if "icon_url" in item]
-                if weather_data and "icon_url" in weather_data:
-                    icon_urls.append(weather_data["icon_url"])
-                if icon_urls:
-                    self.collect_and_load_icons(icon_urls)
-
+        # The cache resolves what is asked for, an ID or coordinates over the name
+        lookup = city if query is None else query
+        self.set_current_city(lookup)
+        self.is_revalidating = False
+        weather_data, weather_age = self.weather_cache.get_entry(lookup, "weather")
+        forecast_data, forecast_age = self.weather_cache.get_entry(lookup, "forecast")
+        is_fresh = (
+            weather_data is not None and forecast_data is not None
+            and weather_age < self.weather_cache.ttls["weather"]
+            and forecast_age < self.weather_cache.ttls["forecast"]
+        )
+        TELEMETRY.count("cache_lookups", result="fresh" if is_fresh else "stale" if weather_data else "miss")
+
+        if is_fresh or (weather_data and Config.STALE_WHILE_REVALIDATE):
+            self.show_cached_weather(weather_data, forecast_data, weather_age)
             self.hide_loading()
-            return
-        
-        self.show_loading(f"Loading weather data for {city}...")
-
-        self.weather_worker = WeatherWorker(city)
-        self.weather_worker.weather_result.connect(self.on_weather_received)
-        self.weather_worker.forecast_result.connect(self.on_forecast_received)
-        self.weather_worker.error.connect(self.on_weather_error)
-        self.weather_worker.finished.connect(self.on_worker_finished)
-
-        self.weather_worker.start()
-
-    def on_weather_received(self, weather_data):
-        city = weather_data["city_name"]
-        if city not in self.weather_cache:
-            self.weather_cache[city] = {}
+            self.record_city_switch("cache" if is_fresh else "stale")
+            if is_fresh:
+                # Nothing to fetch, but results of older lookups must not replace this city
+                self.weather_requests.supersede()
+                STARTUP.mark("first_data")
+                return
+
+            # Stale data stays on screen while it is refreshed in the background
+            self.show_updating()
+        else:
+            self.show_loading(f"Loading weather data for {city}...")
 
-        self.weather_cache[city]["weather"] = weather_data
-        self.last_update[city] = time.time()
+        self.weather_requests.request(city, query=query)
 
+    def on_weather_received(self, city, weather_data, age):
+        # The worker has stored it already, under the city the response names.
+        # With only the forecast fetched it passes on the cached weather and its age
         self.update_weather_display(weather_data)
+        self.record_city_switch("network" if age is None else "cache")
+        STARTUP.mark("first_data")
+        self.data_updated_at = time.time() - (age or 0)
+        self.update_age_label()
+
+    def record_city_switch(self, source):
+        # Time from the lookup to its first data on screen, once per switch
+        if self.switch_started is None:
+            return
+        TELEMETRY.observe("city_switch", time.perf_counter() - self.switch_started, source=source)
+        self.switch_started = None
 
-    def on_forecast_received(self, forecast_data):
+    def on_forecast_received(self, city, forecast_data):
         if forecast_data:
-            city = self.weather_worker.city
-            if city not in self.weather_cache:
-                self.weather_cache[city] = {}
-
-            self.weather_cache[city]["forecast"] = forecast_data
-
             self.update_forecast_display(forecast_data)
 
-            icon_urls = [item.get('icon_url') for item in forecast_data if 'icon_url' in item]
-            if city in self.weather_cache and "weather" in self.weather_cache[city]:
-                weather_data = self.weather_cache[city]["weather"]
-                if weather_data and "icon_url" in weather_data:
-                    icon_urls.append(weather_data["icon_url"])
+            icon_urls = [item.icon_url for item in forecast_data if item.icon_url]
+            weather_data = self.weather_cache.get(self.current_city, "weather", allow_stale=True)
+            if weather_data and weather_data.icon_url:
+                icon_urls.append(weather_data.icon_url)
 
             if icon_urls:
                 self.collect_and_load_icons(icon_urls)
 
-    def on_weather_error(self, error_message):
+    def on_weather_error(self, city, error_message):
+        if self.is_revalidating:
+            # Cached data is already on screen, a failed refresh is not worth a dialog
+            print(f"Background refresh failed: {error_message}")
+            return
+
+        # While the provider is down an expired entry beats an error dialog,
+        # with an open circuit this happens without waiting on the network
+        weather_data, weather_age = self.weather_cache.get_entry(self.current_city, "weather")
+        if weather_data is not None:
+            print(f"Showing cached data for {city}: {error_message}")
+            forecast_data, _ = self.weather_cache.get_entry(self.current_city, "forecast")
+            self.show_cached_weather(weather_data, forecast_data, weather_age)
+            self.hide_loading()
+            self.record_city_switch("fallback")
+            return
+
+        self.switch_started = None
+        TELEMETRY.count("lookup_errors")
         self.show_error_message(error_message)
         self.hide_loading()
 
-    def on_worker_finished(self):
+    def on_worker_finished(self, city):
+        self.is_revalidating = False
         self.hide_loading()
+        self.update_age_label()
 
     def collect_and_load_icons(self, icon_urls):
         if not icon_urls:
             return
 
+        # Keep a reference to every running loader, replacing self.icon_loader
+        # would otherwise destroy a QThread that is still running
         self.icon_loader = IconLoader(icon_urls)
         self.icon_loader.icon_loaded.connect(self.on_icon_loaded)
+        self.icon_loader.finished.connect(lambda loader=self.icon_loader: self.icon_loaders.discard(loader))
+        self.icon_loaders.add(self.icon_loader)
         self.icon_loader.start()
 
-    def on_icon_loaded(self, url, pixmap):
-        if hasattr(self, "weather_worker") and self.weather_worker and hasattr(self.weather_worker, "city"):
-            city = self.weather_worker.city
-            if city in self.weather_cache:
-                weather_data = self.weather_cache[city].get("weather")
-                if weather_data and weather_data.get("icon_url") == url:
-                    self.weather_icon.setPixmap(pixmap)
-                    
-        for date_label, icon_dict in self.forecast_icons.items():
-            if icon_dict['url'] == url:
-                icon_dict['label'].setPixmap(pixmap)
+    def on_icon_loaded(self, url, image):
+        # Pixmaps are scaled once per (icon, size, pixel ratio) on the GUI thread
+        # and reused, so repaints and resizes never rescale them
+        code = icon_code(url)
+        dpr = self.devicePixelRatioF()
+        if self.current_icon_url == url:
+            self.weather_icon.setPixmap(self.scaled_icons.pixmap(code, image, WEATHER_ICON_SIZE, dpr))
+
+        for column in self.forecast_columns:
+            if column["url"] == url:
+                column["icon"].setPixmap(self.scaled_icons.pixmap(code, image, FORECAST_ICON_SIZE, dpr))
+
+    def create_forecast_column(self, i):
+        # Forecast cells are created once and reused on every update
+        date_label = QLabel()
+        date_label.setObjectName("forecast_date")
+        date_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        min_temp_label = QLabel()
+        min_temp_label.setObjectName("weather_value")
+        min_temp_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        max_temp_label = QLabel()
+        max_temp_label.setObjectName("weather_value")
+        max_temp_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        forecast_icon = QLabel()
+        forecast_icon.setObjectName("forecast_icon")
+        forecast_icon.setMinimumSize(70, 70)
+        forecast_icon.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        for widget in [date_label, min_temp_label, max_temp_label, forecast_icon]:
+            widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
+
+        self.forecast_grid.addWidget(date_label, 0, i)
+        self.forecast_grid.addWidget(max_temp_label, 1, i)
+        self.forecast_grid.addWidget(min_temp_label, 2, i)
+        self.forecast_grid.addWidget(forecast_icon, 3, i)
+        self.forecast_grid.setColumnStretch(i, 1)
+
+        return {
+            "date": date_label,
+            "min": min_temp_label,
+            "max": max_temp_label,
+            "icon": forecast_icon,
+            "item": None,
+            "url": None,
+        }
 
     def update_forecast_display(self, current_forecast):
         if not current_forecast:
             return
 
-        # Clear the previous forecast widgets
-        for i in reversed(range(self.forecast_grid.count())):
-            widget = self.forecast_grid.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-
-        self.forecast_icons = {}
-            
-        for i, item in enumerate(current_forecast, 1):
-            date_label = QLabel(item.get("date", ""))
-            date_label.setObjectName("forecast_date")
-            date_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            min_temp_label = QLabel(f"{item.get('temp_min', '')}°C")
-            min_temp_label.setObjectName("weather_value")
-            min_temp_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            max_temp_label = QLabel(f"{item.get('temp_max', '')}°C")
-            max_temp_label.setObjectName("weather_value")
-            max_temp_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            forecast_icon = QLabel()
-            forecast_icon.setObjectName("forecast_icon")
-            forecast_icon.setMinimumSize(70, 70)
-            forecast_icon.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            if self.is_dark_mode:
-                for widget in [date_label, min_temp_label, max_temp_label, forecast_icon]:
-                    widget.setProperty("darkMode", "true")
-                    widget.style().unpolish(widget)
-                    widget.style().polish(widget)
-
-            if "description" in item:
-                weather_condition = self.get_weather_condition(item["description"])
-                date_label.setProperty("weather_condition", weather_condition)
-                min_temp_label.setProperty("weather_condition", weather_condition)
-                max_temp_label.setProperty("weather_condition", weather_condition)
-
-                for label in [date_label, min_temp_label, max_temp_label]:
-                    label.style().unpolish(label)
-                    label.style().polish(label)
-
-            if "date" in item and "icon_url" in item:
-                self.forecast_icons[item["date"]] = {
-                    "label": forecast_icon,
-                    "url": item["icon_url"]
-                }
-
-            date_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
-            min_temp_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
-            max_temp_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
-            forecast_icon.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
-
-            self.forecast_grid.addWidget(date_label, 0, i)
-            self.forecast_grid.addWidget(max_temp_label, 1, i)
-            self.forecast_grid.addWidget(min_temp_label, 2, i)
-            self.forecast_grid.addWidget(forecast_icon, 3, i)
-
-        for widget in self.findChildren(QWidget, "forecast_container"):
-            if self.is_dark_mode:
-                widget.setProperty("darkMode", "true")
-            else:
-                widget.setProperty("darkMode", "false")
-            widget.style().unpolish(widget)
-            widget.style().polish(widget)
-            widget.update()
-
+        start = time.perf_counter()
         self.forecast_grid.setColumnStretch(0, 0)
-        for i in range(1, len(current_forecast) + 1):
-            self.forecast_grid.setColumnStretch(i, 1)
-        
+        while len(self.forecast_columns) < len(current_forecast):
+            self.forecast_columns.append(self.create_forecast_column(len(self.forecast_columns) + 1))
+
+        dpr = self.devicePixelRatioF()
+        for column, item in zip(self.forecast_columns, current_forecast):
+            previous = column["item"]
+            column["item"] = item
+            if previous is None:
+                for key in ("date", "min", "max", "icon"):
+                    column[key].show()
+            elif previous == item:
+                continue
+
+            # Only touch the cells whose value changed
+            if previous is None or previous.date != item.date:
+                column["date"].setText(item.date)
+            if previous is None or previous.temp_min != item.temp_min:
+                column["min"].setText(f"{item.temp_min}°C")
+            if previous is None or previous.temp_max != item.temp_max:
+                column["max"].setText(f"{item.temp_max}°C")
+
+            if column["url"] != item.icon_url:
+                column["url"] = item.icon_url
+                image = ICON_ATLAS.get(icon_code(item.icon_url)) if item.icon_url else None
+                if image is not None:
+                    column["icon"].setPixmap(self.scaled_icons.pixmap(icon_code(item.icon_url), image, FORECAST_ICON_SIZE, dpr))
+                else:
+                    # Filled in by on_icon_loaded
+                    column["icon"].clear()
+
+        # Hide columns left over from a longer forecast
+        for column in self.forecast_columns[len(current_forecast):]:
+            if column["item"] is not None:
+                column["item"] = None
+                column["url"] = None
+                for key in ("date", "min", "max", "icon"):
+                    column[key].hide()
+        self.record_widget_update("forecast", start)
+
     def get_weather(self):
+        if self.city_completer.is_selecting():
+            # The line edit sees Enter before the completer, which submits the suggestion
+            return
         city_name = self.city_input.text().strip()
         if city_name:
             self.get_weather_for_city(city_name)
         else:
             self.show_error_message("City not found. Please check the name and try again.")
 
+    def on_city_chosen(self, city):
+        # A picked suggestion is unambiguous, look it up by ID
+        self.get_weather_for_city(city.label, query=city.id)
+
     def show_loading(self, message="Loading..."):
         self.is_loading = True
         self.status_label.setText(message)
@@ -591,6 +673,34 @@ class WeatherGUI(QWidget):
         self.city_input.setEnabled(False)
         QApplication.processEvents()
 
+    def show_updating(self):
+        self.is_revalidating = True
+        self.update_age_label()
+
+    def update_age_label(self):
+        if self.data_updated_at is None:
+            return
+
+        minutes = int((time.time() - self.data_updated_at) // 60)
+        if minutes < 1:
+            age = "just now"
+        elif minutes < 60:
+            age = f"{minutes} min ago"
+        else:
+            age = f"{minutes // 60} h {minutes % 60} min ago"
+
+        text = f"Updated {age}"
+        if self.is_revalidating:
+            text = f"Updating... (last updated {age})"
+        self.age_label.setText(text)
+
+        updating = "true" if self.is_revalidating else "false"
+        if self.age_label.property("updating") != updating:
+            self.age_label.setProperty("updating", updating)
+            self.age_label.style().unpolish(self.age_label)
+            self.age_label.style().polish(self.age_label)
+        self.age_label.show()
+
     def hide_loading(self):
         self.is_loading = False
         self.status_label.hide()
@@ -602,90 +712,84 @@ class WeatherGUI(QWidget):
         self.is_dark_mode = self.dark_mode_button.isChecked()
         if self.is_dark_mode:
             icon_path = resource_path("assets/light_mode.png")
-            self.dark_mode_button.setIcon(QIcon(icon_path))
-            self.setProperty("darkMode", "true")
         else:
             icon_path = resource_path("assets/dark_mode.png")
-            self.dark_mode_button.setIcon(QIcon(icon_path))
-            self.setProperty("darkMode", "false")
-       
-        for widget in self.findChildren(QWidget):
-            widget.setProperty("darkMode", "true" if self.is_dark_mode else "false")
-            widget.style().unpolish(widget)
-            widget.style().polish(widget)
-            widget.update()
-
-        qapp = QApplication.instance()
-        qapp.setStyleSheet(qapp.styleSheet())
-
-        self.style().unpolish(self)
-        self.style().polish(self)
-        self.update()
+        self.dark_mode_button.setIcon(QIcon(icon_path))
 
+        self.apply_theme()
 
-        if self.current_weather_condition:
-            self.apply_weather_style(self.current_weather_condition)
+    def apply_theme(self):
+        if self.theme is None:
+            return
+        elapsed = self.theme.apply(self, dark=self.is_dark_mode, condition=self.current_weather_condition)
+        if elapsed:
+            TELEMETRY.observe("theme_apply", elapsed)
+        if Config.THEME_TIMING and elapsed:
+            print(f"Theme switch: {elapsed * 1000:.2f} ms for {len(self.findChildren(QWidget))} widgets")
 
     def get_weather_condition_type(self, weather_description):
         weather_description = weather_description.lower()
 
         if "clear" in weather_description:
-            weather_class = "weather-clear"
+            return "clear"
         elif "cloud" in weather_description:
-            weather_class = "weather-clouds"
+            return "clouds"
         elif "rain" in weather_description or "drizzle" in weather_description:
-            weather_class = "weather-rain"
+            return "rain"
         elif "snow" in weather_description:
-            weather_class = "weather-snow"
+            return "snow"
         elif "thunder" in weather_description or "storm" in weather_description:
-            weather_class = "weather-thunderstorm"
+            return "thunderstorm"
         elif "mist" in weather_description or "fog" in weather_description or "haze" in weather_description:
-            weather_class = "weather-mist"
+            return "mist"
         else:
             return "clouds"
 
     def apply_weather_style(self, weather_condition):
-        self.current_weather_condition = weather_condition
-        weather_type = self.get_weather_condition_type(weather_condition)
-        
-        for widget in [self.weather_temp_label, self.weather_description_label,
-                       self.weather_humidity_label, self.weather_wind_speed_label]:
-            widget.setProperty("weatherCondition", weather_type)
-            widget.style().unpolish(widget)
-            widget.style().polish(widget)
-            widget.update()
-
-        if hasattr(self, "weather_panel"):
-            self.weather_panel.setProperty("weatherCondition", weather_type)
-            self.weather_panel.style().unpolish(self.weather_panel)
-            self.weather_panel.style().polish(self.weather_panel)
-            self.weather_panel.update()
-        
-        self.style().unpolish(self)
-        self.style().polish(self)
+        self.current_weather_condition = self.get_weather_condition_type(weather_condition)
+        self.apply_theme()
+
+    def paintEvent(self, event):
+        if not TELEMETRY.enabled:
+            super().paintEvent(event)
+            STARTUP.mark("first_paint")
+            return
+
+        start = time.perf_counter()
+        super().paintEvent(event)
+        end = time.perf_counter()
+        TELEMETRY.observe("paint", end - start)
+        if self.paint_pending_since is not None:
+            # From the first widget update to the frame that shows it
+            TELEMETRY.observe("update_to_paint", end - self.paint_pending_since)
+            self.paint_pending_since = None
+        STARTUP.mark("first_paint")
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self.update_refresher_state()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_refresher_state()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_refresher_state()
+
+    def update_refresher_state(self):
+        # Nobody looks at a hidden or minimized window, refreshing it would only spend quota
+        if not Config.PINNED_REFRESH:
+            return
+        if self.isHidden() or self.isMinimized():
+            self.refresher.pause()
+        else:
+            self.refresher.resume()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        width = self.width()
-        height = self.height()
-
-        if width < 800:
-            self.weather_city_label.setStyleSheet("font-size: 20px;")
-            self.weather_country_label.setStyleSheet
-            self.weather_temp_label.setStyleSheet("font-size: 36px;")
-            self.weather_description_label.setStyleSheet("font-size: 16px;")
-        else:
-            self.weather_city_label.setStyleSheet("font-size: 24px;")
-            self.weather_country_label.setStyleSheet("font-size: 22px;")
-            self.weather_temp_label.setStyleSheet("font-size: 42px;")
-            self.weather_description_label.setStyleSheet("font-size: 18px;")
-
-        if height < 600:
-            self.weather_label.setStyleSheet("font-size: 18px; padding-top: 10px; padding-bottom: 5px;")
-            self.forecast_label.setStyleSheet("font-size: 18px; padding-top: 10px; padding-bottom: 5px;")
-        else:
-            self.weather_label.setStyleSheet("font-size: 20px; padding-top: 20px; padding-bottom: 10px;")
-            self.forecast_label.setStyleSheet("font-size: 20px; padding-top: 20px; padding-bottom: 10px;")
+        self.responsive.update(self.width(), self.height())
 
     def show_error_message(self, message):
             self.hide_loading()
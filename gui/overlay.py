@@ -0,0 +1,81 @@
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QLabel
+from utils.telemetry import TELEMETRY
+
+
+def format_snapshot(snapshot):
+    """Plain text table of a Telemetry snapshot, times in milliseconds."""
+    lines = [f"{'timing':<44}{'n':>6}{'p50':>9}{'p95':>9}{'max':>9}"]
+    for timing in snapshot["timings"]:
+        labels = ",".join(f"{key}={value}" for key, value in timing["labels"].items())
+        name = f"{timing['name']}{{{labels}}}" if labels else timing["name"]
+        lines.append(
+            f"{name[:43]:<44}{timing['count']:>6}"
+            f"{timing['p50'] * 1000:>9.1f}{timing['p95'] * 1000:>9.1f}{timing['max'] * 1000:>9.1f}"
+        )
+
+    lookups = {c["labels"].get("result"): c["value"] for c in snapshot["counters"] if c["name"] == "cache_lookups"}
+    if lookups:
+        total = sum(lookups.values())
+        lines.append("")
+        lines.append(f"cache hit ratio {lookups.get('fresh', 0) / total:.0%} of {total} lookups")
+
+    reads = {}
+    for counter in snapshot["counters"]:
+        if counter["name"] == "cache_reads":
+            result = counter["labels"].get("result")
+            reads[result] = reads.get(result, 0) + counter["value"]
+    if reads:
+        total = sum(reads.values())
+        lines.append(f"cache read hit ratio {1 - reads.get('miss', 0) / total:.0%} of {total} reads")
+
+    if snapshot["counters"]:
+        lines.append("")
+        for counter in snapshot["counters"]:
+            labels = ",".join(f"{key}={value}" for key, value in counter["labels"].items())
+            name = f"{counter['name']}{{{labels}}}" if labels else counter["name"]
+            lines.append(f"{name[:43]:<44}{counter['value']:>6}")
+    return "\n".join(lines)
+
+
+class TelemetryOverlay(QLabel):
+    """Debug overlay drawn over the window, refreshed once a second while shown."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setObjectName("telemetry_overlay")
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+        font = QFont("monospace")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setPointSize(9)
+        self.setFont(font)
+        self.setStyleSheet(
+            "QLabel#telemetry_overlay {"
+            " background-color: rgba(0, 0, 0, 180); color: #e5e7eb;"
+            " padding: 8px; border-radius: 6px; }"
+        )
+        self.hide()
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+
+    def toggle(self):
+        if self.isVisible():
+            self._timer.stop()
+            self.hide()
+        else:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self._timer.start(1000)
+
+    def refresh(self):
+        if not TELEMETRY.enabled:
+            self.setText("Telemetry is off, start with --telemetry or WEATHER_TELEMETRY=1")
+        else:
+            self.setText(format_snapshot(TELEMETRY.snapshot()))
+        self.adjustSize()
+        self.move(10, 10)
@@ -0,0 +1,162 @@
+import math
+import random
+import time
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from api import scheduler
+from config import Config
+from gui.workers import WeatherWorker
+
+
+class PinnedRefresher(QObject):
+    """Keep the cache entries of pinned cities fresh in the background.
+
+    Every entry of a pinned city is refreshed before it expires, so switching
+    to the city is always a cache hit. Within that window the refresh is
+    placed right after the provider's last update before expiry, when there
+    is one, to get the newest data for the same number of calls. A per-city
+    random offset spreads cities pinned together. One single-shot timer is
+    armed for the earliest due city. Refreshes run as BACKGROUND calls, only
+    fetch the kinds that are due, back off after a failure and stop while
+    paused (window hidden or minimized).
+    """
+
+    refreshed = pyqtSignal(str)  # city key, see WeatherCache
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.cadences = {
+            "weather": Config.PROVIDER_WEATHER_CADENCE,
+            "forecast": Config.PROVIDER_FORECAST_CADENCE,
+        }
+        self.lead = Config.REFRESH_LEAD
+        self.jitter = Config.REFRESH_JITTER
+        self.concurrency = Config.REFRESH_CONCURRENCY
+        self.paused = True
+        self.schedule = {}  # city key -> wall clock time it is due
+        self.offsets = {}  # city key -> random offset in [0, jitter)
+        self.failures = {}  # city key -> consecutive failed refreshes
+        self.refreshes = 0
+        self.skipped = 0
+        self._running = {}  # city key -> WeatherWorker
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.run_due)
+
+    def kind_due(self, city, kind, now):
+        _, age = self.cache.get_entry(city, kind)
+        if age is None:
+            return now
+        updated = now - age
+        offset = self.offsets.setdefault(city, random.uniform(0, self.jitter))
+        expires = updated + self.cache.ttls[kind] - self.lead
+        cadence = self.cadences[kind]
+        published = math.floor(expires / cadence) * cadence
+        if published > updated:
+            return min(published + offset, expires)
+        return expires - offset
+
+    def due_time(self, city, now=None):
+        now = time.time() if now is None else now
+        return min(self.kind_due(city, kind, now) for kind in self.cache.KINDS)
+
+    def start(self):
+        self.paused = False
+        self.reschedule()
+
+    def pause(self):
+        self.paused = True
+        self._timer.stop()
+
+    def resume(self):
+        if self.paused:
+            self.start()
+
+    def pin(self, city):
+        self.cache.pin(city)
+        key = self.cache.key(city)
+        self.schedule[key] = self.due_time(key)
+        self._arm()
+
+    def unpin(self, city):
+        self.cache.unpin(city)
+        key = self.cache.key(city)
+        self.schedule.pop(key, None)
+        self._arm()
+
+    def reschedule(self):
+        now = time.time()
+        self.schedule = {city: self.due_time(city, now) for city in self.cache.pinned()}
+        self._arm()
+
+    def _arm(self):
+        # With every slot busy nothing could start, _on_finished arms it again
+        if self.paused or not self.schedule or len(self._running) >= self.concurrency:
+            self._timer.stop()
+            return
+        waiting = [due for city, due in self.schedule.items() if city not in self._running]
+        if not waiting:
+            return
+        delay = max(0.0, min(waiting) - time.time())
+        self._timer.start(int(min(delay, 24 * 60 * 60) * 1000))
+
+    def run_due(self):
+        if self.paused:
+            return
+        now = time.time()
+        for city, due in sorted(self.schedule.items(), key=lambda item: item[1]):
+            if due > now or len(self._running) >= self.concurrency:
+                break
+            if city in self._running:
+                continue
+
+            # A search may have refreshed it meanwhile, only what is due is fetched
+            kinds = [kind for kind in self.cache.KINDS if self.kind_due(city, kind, now) <= now]
+            if not kinds:
+                self.skipped += 1
+                self.schedule[city] = self.due_time(city, now)
+                continue
+            self._refresh(city, kinds)
+        self._arm()
+
+    def _refresh(self, city, kinds):
+        worker = WeatherWorker(
+            city, self.cache, priority=scheduler.BACKGROUND, max_ages={kind: 0 for kind in kinds}
+        )
+        worker.error.connect(lambda message, c=city: print(f"Background refresh of {c} failed: {message}"))
+        worker.finished.connect(lambda c=city: self._on_finished(c))
+        self._running[city] = worker
+        self.refreshes += 1
+        worker.start()
+
+    def _on_finished(self, city):
+        self._running.pop(city, None)
+        if city not in self.schedule:
+            # Unpinned while it was refreshing
+            self._arm()
+            return
+
+        now = time.time()
+        self.offsets.pop(city, None)
+        due = self.due_time(city, now)
+        if due <= now:
+            failures = self.failures.get(city, 0) + 1
+            self.failures[city] = failures
+            due = now + min(Config.REFRESH_RETRY * 2 ** (failures - 1), self.cadences["weather"])
+        else:
+            self.failures.pop(city, None)
+            self.refreshed.emit(city)
+        self.schedule[city] = due
+        self._arm()
+
+    def in_flight(self):
+        return len(self._running)
+
+    def stats(self):
+        return {
+            "pinned": len(self.schedule),
+            "refreshes": self.refreshes,
+            "skipped": self.skipped,
+            "failing": sum(1 for count in self.failures.values() if count),
+            "next_due": min(self.schedule.values()) - time.time() if self.schedule else None,
+        }
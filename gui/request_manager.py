@@ -0,0 +1,113 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from gui.workers import WeatherWorker
+
+
+class WeatherRequestManager(QObject):
+    """Single owner of the weather workers started by the window.
+
+    Lookups for the same normalized city share one in-flight worker. Every
+    lookup bumps a generation token; results from a worker whose generation
+    is no longer current are dropped, and superseded workers are asked to
+    stop before their next request. A lookup made again while its superseded
+    worker is still running rejoins that worker and gets the results dropped
+    meanwhile. Signals carry the city of the lookup, so results can never be
+    attributed to another one.
+    """
+
+    weather_ready = pyqtSignal(str, object, object)  # city, CurrentWeather, age in seconds if cached
+    forecast_ready = pyqtSignal(str, object)  # city, tuple of ForecastDay
+    error = pyqtSignal(str, str)  # city, message
+    finished = pyqtSignal(str)  # city
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.generation = 0
+        self.active_city = None
+        self.requests = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self._in_flight = {}  # lookup alias -> WeatherWorker
+        self._running = set()  # every started worker, until its thread finishes
+
+    def request(self, city, query=None):
+        """Start, or join, a lookup for `city` and make it the current one.
+
+        `query` overrides what is sent to the API, e.g. coordinates.
+        """
+        self.requests += 1
+        # Lookups of the same alias share a worker, "london" and "London " alike
+        key = self.cache.alias(city if query is None else query)
+        self.supersede(keep=key)
+
+        worker = self._in_flight.get(key)
+        rejoined = False
+        if worker is not None and (not worker.superseded or worker.isRunning()):
+            self.coalesced += 1
+            # A -> B -> A while A is still fetching: no second request for A
+            rejoined, worker.superseded = worker.superseded, False
+        else:
+            worker = WeatherWorker(city, self.cache, query=query)
+            worker.dropped = []  # (signal, args) not delivered while superseded
+            worker.weather_result.connect(lambda data, age, w=worker: self._deliver(w, self.weather_ready, data, age))
+            worker.forecast_result.connect(lambda data, w=worker: self._deliver(w, self.forecast_ready, data))
+            worker.error.connect(lambda message, w=worker: self._deliver(w, self.error, message))
+            worker.finished.connect(lambda w=worker, k=key: self._on_finished(k, w))
+            self._in_flight[key] = worker
+            self._running.add(worker)
+            worker.start()
+
+        worker.generation = self.generation
+        self.active_city = worker.city
+        if rejoined:
+            self._replay(worker)
+        return self.generation
+
+    def supersede(self, keep=None):
+        """Invalidate every in-flight lookup except the one for `keep`."""
+        self.generation += 1
+        self.active_city = None
+        for key, worker in self._in_flight.items():
+            if key != keep and worker.generation is not None:
+                worker.generation = None
+                worker.superseded = True
+                self.cancelled += 1
+        return self.generation
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _deliver(self, worker, signal, *args):
+        if worker.generation != self.generation:
+            self.dropped += 1
+            if worker.superseded:
+                worker.dropped.append((signal, args))
+            return
+        signal.emit(worker.city, *args)
+
+    def _replay(self, worker):
+        # Results a rejoined worker produced while it was superseded
+        dropped, worker.dropped = worker.dropped, []
+        for signal, args in dropped:
+            self._deliver(worker, signal, *args)
+
+    def _on_finished(self, key, worker):
+        self._running.discard(worker)
+        if self._in_flight.get(key) is worker:
+            del self._in_flight[key]
+        if worker.generation == self.generation:
+            self.finished.emit(worker.city)
+
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def stats(self):
+        # Every coalesced lookup is a fetch that did not happen
+        return {
+            "requests": self.requests,
+            "saved": self.coalesced,
+            "cancelled": self.cancelled,
+            "dropped_results": self.dropped,
+            "in_flight": len(self._in_flight),
+        }
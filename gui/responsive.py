@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Breakpoint:
+    """Values that apply from `min_size` pixels up to the next breakpoint.
+
+    Ints are font pixel sizes, (top, bottom) tuples are vertical margins. The
+    first breakpoint also applies below its `min_size`, which only matters as
+    the starting point of fluid scaling.
+    """
+
+    name: str
+    min_size: int
+    values: dict
+
+
+WIDTH_BREAKPOINTS = (
+    Breakpoint("compact", 480, {"city": 20, "country": 22, "temp": 36, "description": 16}),
+    Breakpoint("regular", 800, {"city": 24, "country": 22, "temp": 42, "description": 18}),
+)
+
+HEIGHT_BREAKPOINTS = (
+    Breakpoint("short", 400, {"title": 18, "title_margins": (10, 5)}),
+    Breakpoint("tall", 600, {"title": 20, "title_margins": (20, 10)}),
+)
+
+
+def _interpolate(a, b, t):
+    if isinstance(a, tuple):
+        return tuple(round(x + (y - x) * t) for x, y in zip(a, b))
+    return round(a + (b - a) * t)
+
+
+class ResponsiveLayout:
+    """Applies breakpoint values to widgets when the window size changes.
+
+    Nothing happens while the window stays within the same breakpoints. Fonts
+    are set through QFont rather than per-widget stylesheets, so a change
+    never re-parses CSS. With `fluid` enabled, values are interpolated
+    between breakpoints and still only written when a rounded value changes.
+    """
+
+    def __init__(self, width_breakpoints=WIDTH_BREAKPOINTS, height_breakpoints=HEIGHT_BREAKPOINTS, fluid=False):
+        self.width_breakpoints = sorted(width_breakpoints, key=lambda bp: bp.min_size)
+        self.height_breakpoints = sorted(height_breakpoints, key=lambda bp: bp.min_size)
+        self.fluid = fluid
+        self.current = None  # (width breakpoint name, height breakpoint name)
+        self.changes = 0
+        self._widgets = {}  # role -> [widget]
+        self._applied = {}  # role -> last value written
+
+    def bind(self, role, *widgets):
+        self._widgets.setdefault(role, []).extend(widgets)
+
+    @staticmethod
+    def _find(breakpoints, size):
+        index = 0
+        for i, bp in enumerate(breakpoints):
+            if size >= bp.min_size:
+                index = i
+        return index
+
+    def _values(self, breakpoints, size):
+        index = self._find(breakpoints, size)
+        bp = breakpoints[index]
+        if not self.fluid or index + 1 >= len(breakpoints):
+            return dict(bp.values)
+        upper = breakpoints[index + 1]
+        t = min(max((size - bp.min_size) / (upper.min_size - bp.min_size), 0.0), 1.0)
+        return {role: _interpolate(value, upper.values.get(role, value), t) for role, value in bp.values.items()}
+
+    def update(self, width, height):
+        """Returns True if any widget was changed."""
+        key = (
+            self.width_breakpoints[self._find(self.width_breakpoints, width)].name,
+            self.height_breakpoints[self._find(self.height_breakpoints, height)].name,
+        )
+        if key == self.current and not self.fluid:
+            return False
+        self.current = key
+
+        values = self._values(self.width_breakpoints, width)
+        values.update(self._values(self.height_breakpoints, height))
+
+        changed = False
+        for role, value in values.items():
+            if self._applied.get(role) == value:
+                continue
+            self._applied[role] = value
+            changed = True
+            for widget in self._widgets.get(role, []):
+                if isinstance(value, tuple):
+                    margins = widget.contentsMargins()
+                    widget.setContentsMargins(margins.left(), value[0], margins.right(), value[1])
+                else:
+                    font = widget.font()
+                    font.setPixelSize(value)
+                    widget.setFont(font)
+        if changed:
+            self.changes += 1
+        return changed
@@ -0,0 +1,99 @@
+import re
+import time
+
+DARK_PREFIX = 'QWidget[darkMode="true"]'
+CONDITIONS = ("clear", "clouds", "rain", "snow", "thunderstorm", "mist")
+# Static property set once on the labels that follow the weather condition
+CONDITION_TARGET = '[weatherStyled="true"]'
+
+_CONDITION_RE = re.compile(r'\[weatherCondition="(\w+)"\]')
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+
+def parse_stylesheet(text):
+    """Split a Qt stylesheet into (selectors, body) rules, comments removed."""
+    rules = []
+    for chunk in _COMMENT_RE.sub("", text).split("}"):
+        if "{" not in chunk:
+            continue
+        selectors, body = chunk.split("{", 1)
+        selectors = [s.strip() for s in selectors.split(",") if s.strip()]
+        if selectors:
+            rules.append((selectors, body.strip()))
+    return rules
+
+
+def _compile_selector(selector, dark, condition):
+    # Returns the selector as it applies to this variant, or None to drop it
+    if selector.startswith(DARK_PREFIX):
+        if not dark:
+            return None
+        selector = selector[len(DARK_PREFIX):].strip() or "QWidget"
+
+    match = _CONDITION_RE.search(selector)
+    if match:
+        if match.group(1) != condition:
+            return None
+        selector = _CONDITION_RE.sub(CONDITION_TARGET, selector)
+    return selector
+
+
+def compile_variant(rules, dark, condition):
+    out = []
+    for selectors, body in rules:
+        compiled = [s for s in (_compile_selector(s, dark, condition) for s in selectors) if s]
+        if compiled:
+            out.append(f"{', '.join(compiled)} {{\n    {body}\n}}")
+    return "\n\n".join(out)
+
+
+class ThemeEngine:
+    """Precompiled light/dark x weather condition variants of styles.css.
+
+    The stylesheet is parsed once. Every variant resolves the darkMode and
+    weatherCondition property selectors ahead of time, so switching theme is
+    a single setStyleSheet on the top level widget instead of setting
+    properties and repolishing every child. Variants are compiled on first
+    use and kept, only the startup one is needed before the first paint.
+    Engines loaded from the same file share the parsed rules and compiled
+    variants, but every window gets its own engine to track what it shows.
+    """
+
+    _loaded = {}  # path -> (rules, variants)
+
+    def __init__(self, text=None, rules=None, variants=None):
+        self.rules = parse_stylesheet(text) if rules is None else rules
+        self.variants = {} if variants is None else variants
+        self.current = None
+        self.timings = []  # seconds spent in each switch, most recent last
+
+    @classmethod
+    def load(cls, path):
+        shared = cls._loaded.get(path)
+        if shared is None:
+            with open(path, "r") as f:
+                shared = cls._loaded[path] = (parse_stylesheet(f.read()), {})
+        return cls(rules=shared[0], variants=shared[1])
+
+    def variant(self, dark, condition):
+        key = (dark, condition)
+        sheet = self.variants.get(key)
+        if sheet is None:
+            sheet = self.variants[key] = compile_variant(self.rules, dark, condition)
+        return sheet
+
+    def precompile(self):
+        for dark in (False, True):
+            for condition in (None,) + CONDITIONS:
+                self.variant(dark, condition)
+
+    def apply(self, widget, dark=False, condition=None):
+        key = (dark, condition if condition in CONDITIONS else None)
+        if key == self.current:
+            return 0.0
+        start = time.perf_counter()
+        widget.setStyleSheet(self.variant(*key))
+        elapsed = time.perf_counter() - start
+        self.current = key
+        self.timings = self.timings[-49:] + [elapsed]
+        return elapsed
@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt6.QtCore import QThread, pyqtSignal
+from api import scheduler
+from api.weather_service import CityNotFoundError, WeatherService
+from config import Config
+from utils.helpers import Location
+
+
+class LocationWorker(QThread):
+    location_result = pyqtSignal(object)  # GeoLocation
+    location_error = pyqtSignal(str)
+
+    def run(self):
+        try:
+            location = Location.locate()
+            if location:
+                self.location_result.emit(location)
+            else:
+                self.location_error.emit("Could not retrieve location coordinates.")
+        except Exception as e:
+            self.location_error.emit(f"Location error: {str(e)}")
+
+class WeatherWorker(QThread):
+    weather_result = pyqtSignal(object, object)  # CurrentWeather, age in seconds if it came from the cache
+    forecast_result = pyqtSignal(object)  # tuple of ForecastDay
+    error = pyqtSignal(str)
+
+    def __init__(self, city, cache, concurrent=None, query=None, priority=None, max_ages=None):
+        super().__init__()
+        self.city = city
+        # What the cache looks up: the query when there is one (an ID or
+        # coordinates), else the typed name
+        self.lookup = city if query is None else query
+        # What is sent to the API, by ID once the cache knows which city the lookup is
+        self.query = cache.query_for(self.lookup)
+        self.cache = cache
+        self.concurrent = Config.FETCH_CONCURRENT if concurrent is None else concurrent
+        self.weather_service = WeatherService()
+        if priority is not None:
+            self.weather_service.priority = priority
+        # Per kind age after which a cached entry is fetched again, instead of
+        # its TTL, used to refresh pinned cities before they expire
+        self.max_ages = max_ages or {}
+        # Background refreshes must not change which city opens on the next start
+        self.update_last_city = priority is None or priority == scheduler.INTERACTIVE
+        # Set while the lookup is superseded, cleared again if it is rejoined;
+        # unlike Qt's interruption flag it can be reset
+        self.superseded = False
+
+    def cached(self, kind):
+        return self.cached_entry(kind)[0]
+
+    def cached_entry(self, kind):
+        """Return (data, age) of a usable cache entry, or (None, None)."""
+        data, age = self.cache.get_entry(self.lookup, kind)
+        max_age = self.max_ages.get(kind)
+        if data is None or age >= (self.cache.ttls[kind] if max_age is None else max_age):
+            return None, None
+        return data, age
+
+    def store(self, kind, data, key):
+        # Stored under the location the response names, the lookup becomes an alias of it
+        self.cache.add_alias(self.lookup, key)
+        self.cache.set(key, kind, data, update_last_city=self.update_last_city)
+
+    def weather_key(self, weather_data):
+        return self.cache.location_key(weather_data.city_id, weather_data.lat, weather_data.lon, weather_data.city_name)
+
+    def load_weather(self):
+        # Returns (data, age), the age is None for data just fetched
+        weather_data, age = self.cached_entry("weather")
+        if weather_data is None:
+            weather_data = self.weather_service.fetch_current(self.query)
+            if weather_data:
+                self.store("weather", weather_data, self.weather_key(weather_data))
+        return weather_data, age
+
+    def load_forecast(self):
+        forecast_data = self.cached("forecast")
+        if forecast_data is None:
+            payload = self.weather_service.fetch_forecast(self.query)
+            forecast_data = self.weather_service.aggregate_forecast(payload)
+            if forecast_data:
+                city, coord = payload.city, payload.city.coord
+                key = self.cache.location_key(city.id, coord and coord.lat, coord and coord.lon, city.name)
+                self.store("forecast", forecast_data, key)
+        return forecast_data
+
+    def error_message(self, error):
+        if isinstance(error, CityNotFoundError):
+            return f"Could not find weather data for {self.city}."
+        return f"Error: {str(error)}"
+
+    def run(self):
+        if self.weather_service.single_request:
+            self.run_single_request()
+        elif self.concurrent:
+            self.run_concurrent()
+        else:
+            self.run_sequential()
+
+    def run_sequential(self):
+        try:
+            weather_data, age = self.load_weather()
+            if weather_data:
+                self.weather_result.emit(weather_data, age)
+
+                # Superseded lookups skip the second request
+                if self.superseded:
+                    return
+
+                try:
+                    forecast_data = self.load_forecast()
+                except Exception as e:
+                    print(f"Error loading forecast for {self.city}: {str(e)}")
+                    return
+                if forecast_data:
+                    self.forecast_result.emit(forecast_data)
+            else:
+                self.error.emit(f"Could not find weather data for {self.city}.")
+        except Exception as e:
+            self.error.emit(self.error_message(e))
+
+    def run_single_request(self):
+        try:
+            weather_data, age = self.cached_entry("weather")
+            forecast_data = self.cached("forecast")
+            if weather_data is None or forecast_data is None:
+                weather_data, forecast_data = self.weather_service.fetch_bundle(self.query)
+                age = None
+                if weather_data:
+                    key = self.weather_key(weather_data)
+                    self.store("weather", weather_data, key)
+                    if forecast_data:
+                        self.store("forecast", forecast_data, key)
+
+            if weather_data:
+                self.weather_result.emit(weather_data, age)
+                if forecast_data:
+                    self.forecast_result.emit(forecast_data)
+            else:
+                self.error.emit(f"Could not find weather data for {self.city}.")
+        except Exception as e:
+            self.error.emit(self.error_message(e))
+
+    def run_concurrent(self):
+        # Both requests run in parallel and each result is emitted as soon as it
+        # arrives, a failing forecast never holds back the current weather
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {
+                executor.submit(self.load_weather): "weather",
+                executor.submit(self.load_forecast): "forecast",
+            }
+            for future in as_completed(futures):
+                kind = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    if kind == "weather":
+                        self.error.emit(self.error_message(e))
+                    else:
+                        print(f"Error loading forecast for {self.city}: {str(e)}")
+                    continue
+
+                if kind == "weather":
+                    weather_data, age = data
+                    if weather_data:
+                        self.weather_result.emit(weather_data, age)
+                    else:
+                        self.error.emit(f"Could not find weather data for {self.city}.")
+                elif data:
+                    self.forecast_result.emit(data)
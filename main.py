@@ -1,12 +1,61 @@
+import time
+
+# Before any other import, so the startup profile includes the imports
+STARTED = time.perf_counter()
+
 import sys
-from PyQt6.QtWidgets import QApplication
-from gui.main_window import WeatherGUI
+from config import Config
+from utils.profiler import STARTUP
+from utils.telemetry import TELEMETRY
+
 
 def main():
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        STARTUP.enable(start=STARTED)
+
+    dump_path = Config.TELEMETRY_DUMP
+    for arg in list(sys.argv[1:]):
+        if arg == "--telemetry":
+            sys.argv.remove(arg)
+            TELEMETRY.enable()
+        elif arg.startswith("--telemetry-dump="):
+            sys.argv.remove(arg)
+            dump_path = arg.split("=", 1)[1]
+    if Config.TELEMETRY or dump_path:
+        TELEMETRY.enable()
+
+    if sys.argv[1:2] == ["--headless"]:
+        # Before anything imports Qt, the headless mode never loads it
+        from cli import main as headless_main
+        status = headless_main(sys.argv[2:])
+        if dump_path:
+            TELEMETRY.dump(dump_path)
+        sys.exit(status)
+    if sys.argv[1:2] == ["--city-index"]:
+        from api.city_index import main as city_index_main
+        sys.exit(city_index_main(sys.argv[2:]))
+
+    # Qt and the window are imported here so the profiler sees their cost
+    from PyQt6.QtWidgets import QApplication
     app = QApplication(sys.argv)
+    STARTUP.mark("qt_ready")
+
+    from gui.main_window import WeatherGUI
+    STARTUP.mark("gui_imported")
+
     window = WeatherGUI()
+    STARTUP.mark("window_created")
     window.show()
+
+    if dump_path:
+        app.aboutToQuit.connect(lambda: TELEMETRY.dump(dump_path))
+
+    if STARTUP.enabled:
+        # Still report if no data arrives, e.g. when offline
+        from PyQt6.QtCore import QTimer
+        QTimer.singleShot(30 * 1000, STARTUP.report)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
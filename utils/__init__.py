@@ -1 +0,0 @@
-from .helpers import Location
@@ -1,27 +1,156 @@
-import requests
+import json
+import os
+import socket
+import sys
+import time
+from api import transport
+from api.models import GeoLocation
+from config import Config
+
+
+def resource_path(relative_path):
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+
+def _parse_ip_api(data):
+    if data.get("status") != "success":
+        return None
+    return GeoLocation(data["city"], data.get("countryCode", ""), data.get("lat"), data.get("lon"))
+
+
+def _parse_ipapi_co(data):
+    if data.get("error") or not data.get("city"):
+        return None
+    return GeoLocation(data["city"], data.get("country_code", ""), data.get("latitude"), data.get("longitude"))
+
+
+def _parse_ipwho_is(data):
+    if not data.get("success") or not data.get("city"):
+        return None
+    return GeoLocation(data["city"], data.get("country_code", ""), data.get("latitude"), data.get("longitude"))
+
 
 class Location:
+    # Single-hop providers resolve the caller's address themselves. "ipify" is
+    # the original two-hop lookup (ipify for the IP, then ip-api), kept last.
+    PROVIDERS = {
+        "ip-api": {"url": "http://ip-api.com/json/", "parse": _parse_ip_api},
+        "ipapi.co": {"url": "https://ipapi.co/json/", "parse": _parse_ipapi_co},
+        "ipwho.is": {"url": "https://ipwho.is/", "parse": _parse_ipwho_is},
+        "ipify": {"url": None, "parse": None},
+    }
 
-    def get_ip():
+    @staticmethod
+    def get_ip(timeout=None):
         try:
-            response = requests.get('https://api.ipify.org?format=json')
+            response = transport.get('https://api.ipify.org?format=json', timeout=timeout or Config.LOCATION_TIMEOUT, retries=0)
             id_data = response.json()
             return id_data['ip']
         except Exception as e:
             print(f"Error getting IP: {e}")
         return None
 
-
+    @staticmethod
     def get_location():
+        """City name of the current location, or None."""
+        location = Location.locate()
+        return location.city if location else None
+
+    @staticmethod
+    def locate(providers=None, use_cache=True):
+        """Return a GeoLocation for this machine, or None.
+
+        A persisted result is reused while it is younger than LOCATION_TTL and
+        the network fingerprint is unchanged, so most launches need no request
+        at all. Otherwise providers are tried in order, each with its own
+        timeout, until one answers.
+        """
+        fingerprint = Location.network_fingerprint()
+        if use_cache:
+            location = Location.load_cached(fingerprint)
+            if location:
+                return location
+
+        for name in providers or Config.LOCATION_PROVIDERS:
+            provider = Location.PROVIDERS.get(name)
+            if provider is None:
+                print(f"Unknown location provider: {name}")
+                continue
+            location = Location.query_provider(name, provider)
+            if location:
+                Location.save_cached(location, fingerprint)
+                return location
+        return None
+
+    @staticmethod
+    def query_provider(name, provider):
+        # A timeout configured for the provider, else the one its entry declares, else the global one
+        timeout = Config.LOCATION_TIMEOUTS.get(name) or provider.get("timeout", Config.LOCATION_TIMEOUT)
         try:
-            ip = Location.get_ip()
-            if not ip:
-                return None, None
-            response = requests.get("http://ip-api.com/json/{}".format(ip))
-            data = response.json()
-            if data['status'] == 'success':
-                return data["city"]
+            if provider["url"] is None:
+                ip = Location.get_ip(timeout)
+                if not ip:
+                    return None
+                response = transport.get("http://ip-api.com/json/{}".format(ip), timeout=timeout, retries=0)
+                location = _parse_ip_api(response.json())
+            else:
+                response = transport.get(provider["url"], timeout=timeout, retries=0)
+                location = provider["parse"](response.json())
         except Exception as e:
-            print(f"Error getting location: {e}")
-        return None
+            print(f"Error getting location from {name}: {e}")
+            return None
+        if location is None:
+            return None
+        return GeoLocation(location.city, location.country, location.lat, location.lon, name)
 
+    @staticmethod
+    def network_fingerprint():
+        # The local address of the default route changes with the network. A
+        # UDP connect only selects a route, no packet is sent.
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect(("192.0.2.1", 80))
+                local_ip = s.getsockname()[0]
+        except OSError:
+            local_ip = "offline"
+        return f"{socket.gethostname()}/{local_ip}"
+
+    @staticmethod
+    def load_cached(fingerprint):
+        try:
+            with open(Config.LOCATION_FILE, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("fingerprint") != fingerprint or time.time() - data.get("saved_at", 0) > Config.LOCATION_TTL:
+            return None
+        try:
+            return GeoLocation(**data["location"])
+        except (KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def save_cached(location, fingerprint):
+        try:
+            os.makedirs(os.path.dirname(Config.LOCATION_FILE), exist_ok=True)
+            tmp_path = f"{Config.LOCATION_FILE}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "location": {
+                        "city": location.city,
+                        "country": location.country,
+                        "lat": location.lat,
+                        "lon": location.lon,
+                        "provider": location.provider,
+                    },
+                    "saved_at": time.time(),
+                    "fingerprint": fingerprint,
+                }, f)
+            os.replace(tmp_path, Config.LOCATION_FILE)
+        except OSError as e:
+            print(f"Error saving location: {e}")
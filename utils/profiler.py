@@ -0,0 +1,42 @@
+import sys
+import time
+
+
+class StartupProfiler:
+    """Named timestamps from process start, printed with --profile-startup.
+
+    mark() is a no-op until enable() is called, so the calls can stay in the
+    startup path permanently. main.py passes the time it started to enable(),
+    this module is imported too late for its own import time to count.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.enabled = False
+        self.marks = {}
+        self.reported = False
+
+    def enable(self, start=None):
+        self.enabled = True
+        if start is not None:
+            self.start = start
+
+    def mark(self, name):
+        if not self.enabled or name in self.marks:
+            return
+        self.marks[name] = time.perf_counter() - self.start
+        # Time-to-data is the last milestone of a cold start
+        if name == "first_data":
+            self.report()
+
+    def report(self, file=None):
+        if self.reported:
+            return
+        self.reported = True
+        file = file or sys.stderr
+        print("Startup profile (ms since main.py started):", file=file)
+        for name, elapsed in sorted(self.marks.items(), key=lambda item: item[1]):
+            print(f"  {name:<20} {elapsed * 1000:9.1f}", file=file)
+
+
+STARTUP = StartupProfiler()
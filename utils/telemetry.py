@@ -0,0 +1,178 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+
+# Histogram bucket bounds in seconds, shared by every timing
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("telemetry", "name", "labels", "start")
+
+    def __init__(self, telemetry, name, labels):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.telemetry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _Series:
+    __slots__ = ("count", "total", "max", "buckets", "recent")
+
+    def __init__(self, samples):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.recent = deque(maxlen=samples)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        self.recent.append(value)
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Telemetry:
+    """Timings and counters of the hot paths, off unless enabled.
+
+    While disabled timer() returns a shared no-op context manager and
+    observe()/count() return right away, so instrumented code costs one
+    attribute check. Timings keep Prometheus-style buckets plus the last
+    `samples` values for the percentiles shown in the overlay.
+    """
+
+    def __init__(self, samples=256):
+        self.enabled = False
+        self.samples = samples
+        self.started = time.time()
+        self._timings = {}  # (name, labels) -> _Series
+        self._counters = {}  # (name, labels) -> value
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._timings.get(key)
+            if series is None:
+                series = self._timings[key] = _Series(self.samples)
+            series.add(seconds)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            timings = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": series.count,
+                    "sum": series.total,
+                    "max": series.max,
+                    "p50": series.quantile(0.5),
+                    "p95": series.quantile(0.95),
+                    "buckets": list(series.buckets),
+                }
+                for (name, labels), series in sorted(self._timings.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {"started": self.started, "timings": timings, "counters": counters}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="weatherapp_"):
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+        for timing in snapshot["timings"]:
+            name = f"{prefix}{timing['name']}_seconds"
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), timing["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(timing['labels'], le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(timing['labels'])} {timing['sum']:.6f}")
+            lines.append(f"{name}_count{_labels(timing['labels'])} {timing['count']}")
+        for counter in snapshot["counters"]:
+            name = f"{prefix}{counter['name']}_total"
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(counter['labels'])} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the measurements to `path`, Prometheus text for .prom/.txt, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+TELEMETRY = Telemetry()